@@ -32,6 +32,13 @@ class ThaiIDClassifier(private val context: Context) {
     private var inputImageBuffer: ByteBuffer? = null
     private var outputProbabilityBuffer: Array<ByteArray>? = null
     
+    // Parâmetros de quantização int8 lidos dos tensores do modelo:
+    // q = valor / escala + zero_point
+    private var inputScale = 1.0f / 255.0f
+    private var inputZeroPoint = -128
+    private var outputScale = 1.0f / 256.0f
+    private var outputZeroPoint = -128
+    
     fun initialize(): Boolean {
         try {
             val model = loadModelFile()
@@ -59,12 +66,25 @@ class ThaiIDClassifier(private val context: Context) {
     }
     
     private fun setupBuffers() {
-        // Buffer de entrada: 1 x 224 x 224 x 3 (UINT8)
+        interpreter?.let {
+            val inputParams = it.getInputTensor(0).quantizationParams()
+            val outputParams = it.getOutputTensor(0).quantizationParams()
+            if (inputParams.scale != 0.0f) {
+                inputScale = inputParams.scale
+                inputZeroPoint = inputParams.zeroPoint
+            }
+            if (outputParams.scale != 0.0f) {
+                outputScale = outputParams.scale
+                outputZeroPoint = outputParams.zeroPoint
+            }
+        }
+        
+        // Buffer de entrada: 1 x 224 x 224 x 3 (INT8)
         val inputSize = BATCH_SIZE * INPUT_SIZE * INPUT_SIZE * PIXEL_SIZE
         inputImageBuffer = ByteBuffer.allocateDirect(inputSize)
         inputImageBuffer?.order(ByteOrder.nativeOrder())
         
-        // Buffer de saída: 1 x 3 (UINT8)
+        // Buffer de saída: 1 x 3 (INT8)
         outputProbabilityBuffer = Array(BATCH_SIZE) { ByteArray(NUM_CLASSES) }
     }
     
@@ -102,27 +122,34 @@ class ThaiIDClassifier(private val context: Context) {
             for (j in 0 until INPUT_SIZE) {
                 val value = intValues[pixel++]
                 
-                // Extrair valores RGB e converter para UINT8
-                val r = ((value shr 16) and 0xFF).toByte()
-                val g = ((value shr 8) and 0xFF).toByte()
-                val b = (value and 0xFF).toByte()
-                
-                inputImageBuffer?.put(r)
-                inputImageBuffer?.put(g)
-                inputImageBuffer?.put(b)
+                // Extrair valores RGB e quantizar para INT8
+                inputImageBuffer?.put(quantizePixel((value shr 16) and 0xFF))
+                inputImageBuffer?.put(quantizePixel((value shr 8) and 0xFF))
+                inputImageBuffer?.put(quantizePixel(value and 0xFF))
             }
         }
     }
     
+    // Pixel 0-255 -> [0, 1] -> INT8 com a escala/zero_point da entrada
+    private fun quantizePixel(pixel: Int): Byte {
+        val q = Math.round(pixel / 255.0f / inputScale) + inputZeroPoint
+        return q.coerceIn(-128, 127).toByte()
+    }
+    
+    // INT8 da saída -> probabilidade (0-1)
+    private fun dequantize(value: Byte): Float {
+        return (value.toInt() - outputZeroPoint) * outputScale
+    }
+    
     private fun processOutput(): ClassificationResult {
         val probabilities = outputProbabilityBuffer!![0]
         
-        // Encontrar classe com maior probabilidade
+        // Encontrar classe com maior probabilidade (INT8 com sinal)
         var maxIndex = 0
-        var maxValue = probabilities[0].toInt() and 0xFF
+        var maxValue = probabilities[0].toInt()
         
         for (i in 1 until NUM_CLASSES) {
-            val value = probabilities[i].toInt() and 0xFF
+            val value = probabilities[i].toInt()
             if (value > maxValue) {
                 maxValue = value
                 maxIndex = i
@@ -135,12 +162,12 @@ class ThaiIDClassifier(private val context: Context) {
             "unknown"
         }
         
-        // Converter UINT8 para probabilidade normalizada (0-1)
-        val confidence = maxValue / 255.0f
+        // Desquantizar para probabilidades normalizadas (0-1)
+        val confidence = dequantize(probabilities[maxIndex])
         
         // Criar array de todas as probabilidades
         val allProbabilities = FloatArray(NUM_CLASSES) { i ->
-            (probabilities[i].toInt() and 0xFF) / 255.0f
+            dequantize(probabilities[i])
         }
         
         return ClassificationResult(
@@ -4,31 +4,54 @@ Script para converter o modelo fine_tuned_model_extended.h5 para TFLite
 """
 
 import os
+import random
+import cv2
 import numpy as np
 from tflite_converter import TFLiteConverter
-from data_loader import ThaiIDDataLoader
+from data_loader import ThaiIDDataLoader, list_image_files
 
-def load_sample_data():
-    """Carrega uma amostra dos dados para dataset representativo"""
+def _load_image(image_path, img_size=(224, 224)):
+    """Lê uma imagem já no formato de entrada do modelo (1, H, W, 3) float32"""
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    # BGR->RGB como view (sem cópia); o astype já gera o array contíguo
+    image = cv2.resize(image, img_size)[..., ::-1]
+    return image[None].astype(np.float32) / 255.0
+
+def load_sample_data(num_calibration=200, num_test=5):
+    """
+    Prepara os dados de amostra:
+    - gerador do dataset representativo, que lê uma imagem por vez
+      (memória constante durante a calibração)
+    - poucas imagens em memória para testar/comparar o modelo TFLite
+    """
     print("Carregando dados de amostra...")
     
     try:
         data_loader = ThaiIDDataLoader("dataset/")
-        X, y, classes = data_loader.load_data()
-        
-        if X is not None and len(X) > 0:
-            # Normalizar se necessário
-            if X.dtype != np.float32:
-                X = X.astype(np.float32)
-            if np.max(X) > 1.0:
-                X = X / 255.0
-            
-            print(f"Dados carregados: {X.shape}")
-            return X[:20], classes  # Usar apenas 20 amostras para dataset representativo
+        image_paths = [os.path.join(data_loader.images_path, f)
+                       for f in list_image_files(data_loader.images_path)]
     except Exception as e:
         print(f"Erro ao carregar dados: {e}")
+        return None, None
+    
+    if not image_paths:
+        return None, None
+    
+    calibration_paths = random.sample(image_paths, min(num_calibration, len(image_paths)))
     
-    return None, None
+    def representative_data_gen():
+        for image_path in calibration_paths:
+            image = _load_image(image_path)
+            if image is not None:
+                yield [image]
+    
+    test_images = [image for image in map(_load_image, image_paths[:num_test]) if image is not None]
+    X_test = np.concatenate(test_images) if test_images else None
+    
+    print(f"Dataset representativo: {len(calibration_paths)} imagens (streaming)")
+    return representative_data_gen, X_test
 
 def convert_model():
     """Converte o modelo fine_tuned_model_extended.h5 para TFLite"""
@@ -50,27 +73,24 @@ def convert_model():
     print(f"📁 Arquivo de saída: {output_path}")
     
     # Carregar dados de amostra para quantização
-    X_sample, classes = load_sample_data()
+    representative_dataset, X_sample = load_sample_data()
     
     # Criar conversor
     converter = TFLiteConverter(model_path=model_path)
     
-    if converter.model is None:
+    if converter.model is None and converter.saved_model_dir is None:
         print("❌ Erro ao carregar modelo")
         return False
     
-    # Configurar dataset representativo se dados estão disponíveis
-    representative_dataset = None
-    if X_sample is not None:
-        representative_dataset = converter.create_representative_dataset(X_sample)
+    if representative_dataset is not None:
         print("✅ Dataset representativo criado")
     
-    # Converter modelo
+    # Converter modelo (int8 completo com I/O int8)
     print("\n🔄 Iniciando conversão...")
     tflite_model = converter.convert_to_tflite(
         quantization=True,
         representative_dataset=representative_dataset,
-        optimize_for_size=True
+        optimize_for_size=False
     )
     
     if tflite_model is None:
@@ -93,7 +113,7 @@ def convert_model():
     if X_sample is not None:
         print("\n🧪 Testando modelo TFLite...")
         try:
-            predictions = converter.test_tflite_model(output_path, X_sample[:5])
+            predictions = converter.test_tflite_model(output_path, X_sample[:5], verbose=True)
             if predictions:
                 print("✅ Teste do modelo TFLite bem-sucedido!")
         except Exception as e:
@@ -103,7 +123,7 @@ def convert_model():
     if X_sample is not None:
         print("\n🔍 Comparando modelos...")
         try:
-            converter.compare_models(converter.model, output_path, X_sample[:5])
+            converter.compare_models(converter.model, output_path, X_sample[:5], verbose=True)
         except Exception as e:
             print(f"⚠️ Erro na comparação: {e}")
     
@@ -1,14 +1,84 @@
 import os
 import json
+import functools
 import cv2
 import numpy as np
-from tensorflow.keras.utils import to_categorical
 import glob
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+IMAGE_EXTENSIONS = frozenset(('.png', '.jpg', '.jpeg', '.webp'))
+
+# Formatos que o tf.io.decode_image decodifica (o .webp só pelo OpenCV)
+TF_DECODE_EXTENSIONS = frozenset(('.png', '.jpg', '.jpeg'))
+
+def list_image_files(directory):
+    """Lista os nomes dos arquivos de imagem de um diretório (uma única varredura via scandir)"""
+    with os.scandir(directory) as entries:
+        return [entry.name for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS]
+
+@functools.lru_cache(maxsize=8)
+def load_class_names(classes_file):
+    """Lê o classes.txt uma única vez por processo (cache pelo caminho)"""
+    with open(classes_file, 'r', encoding='utf-8') as f:
+        return tuple(line.strip() for line in f if line.strip())
+
+def read_image(image_path, target_size=None):
+    """
+    Lê imagem em BGR. Se o destino for `target_size` (w, h) e o arquivo for
+    JPEG com pelo menos o dobro desse tamanho, decodifica já reduzido pela
+    metade: o libjpeg escala na IDCT, bem mais barato que decodificar em
+    resolução cheia e depois redimensionar.
+    """
+    if target_size is not None and os.path.splitext(image_path)[1].lower() in ('.jpg', '.jpeg'):
+        image = cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_2)
+        if image is not None and image.shape[1] >= target_size[0] and image.shape[0] >= target_size[1]:
+            return image
+    return cv2.imread(image_path, cv2.IMREAD_COLOR)
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _bgr_to_rgb_normalize_kernel(src, dst):
+        scale = np.float32(1.0 / 255.0)
+        n, h, w, _ = src.shape
+        for i in prange(n):
+            for y in range(h):
+                for x in range(w):
+                    dst[i, y, x, 0] = src[i, y, x, 2] * scale
+                    dst[i, y, x, 1] = src[i, y, x, 1] * scale
+                    dst[i, y, x, 2] = src[i, y, x, 0] * scale
+else:
+    _bgr_to_rgb_normalize_kernel = None
+
+def bgr_to_rgb_normalize(src, dst):
+    """
+    Converte um lote uint8 BGR (N, H, W, 3) para RGB float32 em [0, 1],
+    escrevendo em `dst` numa única passada (kernel Numba paralelo quando
+    disponível, senão um ufunc NumPy sobre a view com canais invertidos)
+    """
+    if _bgr_to_rgb_normalize_kernel is not None:
+        _bgr_to_rgb_normalize_kernel(src, dst)
+    else:
+        np.multiply(src[..., ::-1], np.float32(1.0 / 255.0), out=dst)
+
 class ThaiIDDataLoader:
-    def __init__(self, dataset_path="dataset/"):
+    def __init__(self, dataset_path="dataset/", cache_images=False):
+        """
+        Args:
+            dataset_path: Pasta raiz do dataset
+            cache_images: Guarda as imagens decodificadas/redimensionadas num
+                .npy (memmap) na raiz do dataset, reaproveitado nas próximas
+                cargas. Opcional: o cache pode ocupar centenas de MB
+                (.image_cache_*, ignorado pelo git)
+        """
         self.dataset_path = dataset_path
+        self.cache_images = cache_images
         self.images_path = os.path.join(dataset_path, 'images')
         self.labels_path = os.path.join(dataset_path, 'labels')
         self.classes_file = os.path.join(dataset_path, 'classes.txt')
@@ -28,61 +98,84 @@ class ThaiIDDataLoader:
     def _load_classes(self):
         """Carrega as classes do arquivo classes.txt"""
         if os.path.exists(self.classes_file):
-            with open(self.classes_file, 'r', encoding='utf-8') as f:
-                classes = [line.strip() for line in f.readlines() if line.strip()]
-            return classes
+            return list(load_class_names(self.classes_file))
         else:
             raise FileNotFoundError(f"Arquivo {self.classes_file} não encontrado")
     
     def _parse_yolo_label(self, label_path):
         """Parse do arquivo label no formato YOLO"""
+        if not os.path.exists(label_path) or os.path.getsize(label_path) == 0:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.int32)
+        
+        try:
+            # Parser em C do NumPy: uma linha por box, colunas class x y w h
+            arr = np.loadtxt(label_path, dtype=np.float32, usecols=range(5), ndmin=2)
+            return arr[:, 1:5], arr[:, 0].astype(np.int32)
+        except ValueError:
+            return self._parse_yolo_label_lines(label_path)
+    
+    def _parse_yolo_label_lines(self, label_path):
+        """Parse linha a linha, para arquivos irregulares"""
         boxes = []
         classes = []
         
-        if os.path.exists(label_path):
-            with open(label_path, 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) >= 5:
-                        class_id = int(parts[0])
-                        x_center = float(parts[1])
-                        y_center = float(parts[2])
-                        width = float(parts[3])
-                        height = float(parts[4])
-                        
-                        boxes.append([x_center, y_center, width, height])
-                        classes.append(class_id)
-        
-        return np.array(boxes), np.array(classes)
+        with open(label_path, 'r') as f:
+            for line in f:
+                parts = line.strip().split()
+                if len(parts) >= 5:
+                    class_id = int(parts[0])
+                    x_center = float(parts[1])
+                    y_center = float(parts[2])
+                    width = float(parts[3])
+                    height = float(parts[4])
+                    
+                    boxes.append([x_center, y_center, width, height])
+                    classes.append(class_id)
+        
+        return np.array(boxes, dtype=np.float32).reshape(-1, 4), np.array(classes, dtype=np.int32)
     
-    def load_data_for_classification(self, img_size=(224, 224), max_samples_per_class=None):
+    def load_data_for_classification(self, img_size=(224, 224), max_samples_per_class=None,
+                                     normalize=True):
         """
         Carrega dados para classificação de imagem.
         Para cada imagem, usa a classe mais frequente nas bounding boxes.
+        
+        Args:
+            normalize: True retorna float32 RGB em [0, 1]; False retorna
+                uint8 RGB (4x menos memória, normalizar depois por lote)
         """
-        images = []
-        labels = []
+        # Primeira passada: só labels, para saber quantas amostras alocar
+        img_paths, labels = self.list_classification_samples(max_samples_per_class)
+        
+        # Segunda passada: decodificar direto no tensor pré-alocado
+        images = np.empty((len(img_paths), img_size[1], img_size[0], 3),
+                          dtype=np.float32 if normalize else np.uint8)
+        loaded = self._read_images_into(list(img_paths), img_size, images)
+        
+        if not loaded.all():
+            images, labels = images[loaded], labels[loaded]
         
+        print(f"Dados carregados: {len(images)} imagens")
+        self._print_class_counts(labels)
+        
+        return images, labels
+    
+    def list_classification_samples(self, max_samples_per_class=None):
+        """
+        Lista as amostras de classificação sem decodificar nenhuma imagem:
+        caminhos (array de str) e a classe mais frequente nas bounding
+        boxes de cada uma (int32)
+        """
         # Listar arquivos de imagem
-        image_files = [f for f in os.listdir(self.images_path) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+        image_files = list_image_files(self.images_path)
         
         print(f"Processando {len(image_files)} imagens...")
         
         class_counts = {i: 0 for i in range(self.num_classes)}
         
+        img_paths = []
+        labels = []
         for img_file in image_files:
-            # Carregar imagem
-            img_path = os.path.join(self.images_path, img_file)
-            image = cv2.imread(img_path)
-            if image is None:
-                continue
-                
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image = cv2.resize(image, img_size)
-            image = image.astype('float32') / 255.0
-            
-            # Carregar label correspondente
             label_file = os.path.splitext(img_file)[0] + '.txt'
             label_path = os.path.join(self.labels_path, label_file)
             
@@ -90,45 +183,53 @@ class ThaiIDDataLoader:
             
             if len(box_classes) > 0:
                 # Usar a classe mais frequente na imagem
-                unique, counts = np.unique(box_classes, return_counts=True)
-                most_frequent_class = unique[np.argmax(counts)]
+                most_frequent_class = int(np.bincount(box_classes, minlength=self.num_classes).argmax())
                 
                 # Verificar limite de amostras por classe
                 if max_samples_per_class is None or class_counts[most_frequent_class] < max_samples_per_class:
-                    images.append(image)
+                    img_paths.append(os.path.join(self.images_path, img_file))
                     labels.append(most_frequent_class)
                     class_counts[most_frequent_class] += 1
         
-        print(f"Dados carregados: {len(images)} imagens")
-        print("Distribuição por classe:")
-        for i, class_name in enumerate(self.classes):
-            print(f"  {class_name}: {class_counts[i]} imagens")
+        return np.array(img_paths, dtype=str), np.array(labels, dtype=np.int32)
+    
+    def load_images(self, img_paths, img_size=(224, 224)):
+        """
+        Decodifica uma lista de caminhos para float32 RGB em [0, 1] (sem o
+        cache em disco, que é do dataset inteiro). Retorna (imagens, máscara
+        booleana de sucesso); só as imagens lidas são devolvidas
+        """
+        raw = np.empty((len(img_paths), img_size[1], img_size[0], 3), dtype=np.uint8)
+        loaded = self._decode_images_into(list(img_paths), img_size, raw)
         
-        return np.array(images), np.array(labels)
+        images = np.empty(raw.shape, dtype=np.float32)
+        bgr_to_rgb_normalize(raw, images)
+        if not loaded.all():
+            images = images[loaded]
+        return images, loaded
+    
+    def _print_class_counts(self, labels):
+        """Imprime a distribuição de amostras por classe"""
+        counts = np.bincount(labels, minlength=self.num_classes)
+        print("Distribuição por classe:")
+        for class_name, count in zip(self.classes, counts):
+            print(f"  {class_name}: {count} imagens")
     
     def load_data_for_detection(self, img_size=(416, 416)):
         """
         Carrega dados para detecção de objetos (formato YOLO).
         Retorna imagens e bounding boxes.
         """
-        images = []
         all_boxes = []
         all_classes = []
         
-        image_files = [f for f in os.listdir(self.images_path) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+        image_files = list_image_files(self.images_path)
+        
+        # Escala YOLO (relativa) -> coordenadas absolutas
+        scale = np.array([img_size[1], img_size[0], img_size[1], img_size[0]], dtype=np.float32)
         
+        samples = []
         for img_file in image_files:
-            img_path = os.path.join(self.images_path, img_file)
-            image = cv2.imread(img_path)
-            if image is None:
-                continue
-            
-            original_h, original_w = image.shape[:2]
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image = cv2.resize(image, img_size)
-            image = image.astype('float32') / 255.0
-            
             # Carregar annotations
             label_file = os.path.splitext(img_file)[0] + '.txt'
             label_path = os.path.join(self.labels_path, label_file)
@@ -136,17 +237,114 @@ class ThaiIDDataLoader:
             boxes, box_classes = self._parse_yolo_label(label_path)
             
             if len(boxes) > 0:
-                # Converter coordenadas YOLO para formato absoluto
-                boxes[:, 0] *= img_size[1]  # x_center
-                boxes[:, 1] *= img_size[0]  # y_center
-                boxes[:, 2] *= img_size[1]  # width
-                boxes[:, 3] *= img_size[0]  # height
-                
-                images.append(image)
-                all_boxes.append(boxes)
-                all_classes.append(box_classes)
+                samples.append((img_file, boxes, box_classes))
+        
+        images = np.empty((len(samples), img_size[1], img_size[0], 3), dtype=np.float32)
+        
+        img_paths = [os.path.join(self.images_path, img_file) for img_file, _, _ in samples]
+        loaded = self._read_images_into(img_paths, img_size, images)
+        
+        for (img_file, boxes, box_classes), ok in zip(samples, loaded):
+            if not ok:
+                continue
+            
+            boxes *= scale
+            
+            all_boxes.append(boxes)
+            all_classes.append(box_classes)
+        
+        if not loaded.all():
+            images = images[loaded]
+        
+        return images, all_boxes, all_classes
+    
+    def _read_images_into(self, img_paths, img_size, images):
+        """
+        Obtém o lote uint8 BGR das imagens (do cache em disco ou decodificando)
+        e converte BGR->RGB (e normaliza, se `images` for float) o lote
+        inteiro em `images`. Retorna máscara booleana de sucesso.
+        """
+        if self.cache_images and len(img_paths) > 0:
+            raw, loaded = self._load_cached_images(img_paths, img_size, images.shape)
+        else:
+            raw = np.empty(images.shape, dtype=np.uint8)
+            loaded = self._decode_images_into(img_paths, img_size, raw)
+        
+        if images.dtype == np.uint8:
+            images[...] = raw[..., ::-1]
+        else:
+            bgr_to_rgb_normalize(raw, images)
+        return loaded
+    
+    def _load_cached_images(self, img_paths, img_size, shape):
+        """
+        Cache das imagens decodificadas: um .npy uint8 (N, H, W, 3) lido via
+        memmap mais um .json com nome/mtime/tamanho de cada arquivo. Se algum
+        arquivo mudou, o cache é refeito decodificando direto no memmap.
+        """
+        base = os.path.join(self.dataset_path, f".image_cache_{img_size[0]}x{img_size[1]}")
+        cache_file, index_file = base + '.npy', base + '.json'
+        
+        signature = []
+        for img_path in img_paths:
+            try:
+                st = os.stat(img_path)
+                signature.append([os.path.basename(img_path), st.st_mtime_ns, st.st_size])
+            except OSError:
+                signature.append([os.path.basename(img_path), None, None])
+        
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index['files'] == signature:
+                raw = np.load(cache_file, mmap_mode='r')
+                if raw.shape == tuple(shape):
+                    print(f"Imagens carregadas do cache: {cache_file}")
+                    return raw, np.array(index['loaded'], dtype=bool)
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        try:
+            raw = np.lib.format.open_memmap(cache_file, mode='w+', dtype=np.uint8, shape=tuple(shape))
+        except OSError:
+            # Dataset somente leitura: decodifica em memória, sem cache
+            raw = np.empty(shape, dtype=np.uint8)
+            return raw, self._decode_images_into(img_paths, img_size, raw)
+        
+        loaded = self._decode_images_into(img_paths, img_size, raw)
+        raw.flush()
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump({'files': signature, 'loaded': loaded.tolist()}, f)
+        
+        return raw, loaded
+    
+    def _decode_images_into(self, img_paths, img_size, raw):
+        """
+        Decodifica as imagens em paralelo no lote uint8 `raw`. O OpenCV
+        libera o GIL durante decode/resize, então threads escalam com o
+        número de núcleos. Retorna máscara booleana de sucesso.
+        """
+        def load_one(i_path):
+            i, img_path = i_path
+            return self._read_image_into(img_path, img_size, raw[i])
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            loaded = np.fromiter(executor.map(load_one, enumerate(img_paths)),
+                                 dtype=bool, count=len(img_paths))
+        
+        return loaded
+    
+    def _read_image_into(self, img_path, img_size, out):
+        """
+        Lê e redimensiona a imagem (BGR, uint8) escrevendo direto em `out`.
+        Retorna False se a leitura falhar.
+        """
+        image = read_image(img_path, img_size)
+        if image is None:
+            return False
         
-        return np.array(images), all_boxes, all_classes
+        cv2.resize(image, img_size, dst=out, interpolation=cv2.INTER_AREA)
+        return True
     
     def get_class_names(self):
         """Retorna lista de nomes das classes"""
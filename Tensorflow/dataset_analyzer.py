@@ -3,24 +3,46 @@ import json
 import cv2
 import numpy as np
 from collections import Counter
-import matplotlib.pyplot as plt
+from data_loader import list_image_files, load_class_names
 
 class DatasetAnalyzer:
-    def __init__(self, dataset_path="dataset/"):
+    def __init__(self, dataset_path="dataset/", preloaded_entries=None):
+        """
+        Args:
+            dataset_path: Pasta raiz do dataset
+            preloaded_entries: Entradas de os.scandir(dataset_path) já lidas
+                pelo chamador; evita novos stat() para classes/notas/labels
+        """
         self.dataset_path = dataset_path
         self.images_path = os.path.join(dataset_path, 'images')
         self.labels_path = os.path.join(dataset_path, 'labels')
         self.classes_file = os.path.join(dataset_path, 'classes.txt')
         self.notes_file = os.path.join(dataset_path, 'notes.json')
+        
+        self._entries = None
+        if preloaded_entries is not None:
+            self._entries = {entry.name: entry for entry in preloaded_entries}
+        self._image_files = None
+    
+    def _exists(self, path):
+        """Existência de um item da raiz do dataset (usa as entradas pré-carregadas)"""
+        if self._entries is None:
+            return os.path.exists(path)
+        return os.path.basename(path) in self._entries
+    
+    def _list_images(self):
+        """Lista as imagens uma única vez por analisador"""
+        if self._image_files is None:
+            self._image_files = list_image_files(self.images_path)
+        return self._image_files
     
     def analyze_dataset(self):
         """Analisa a estrutura do dataset"""
         print("=== ANÁLISE DO DATASET ===")
         
         # Verificar arquivos principais
-        if os.path.exists(self.classes_file):
-            with open(self.classes_file, 'r', encoding='utf-8') as f:
-                classes = [line.strip() for line in f.readlines() if line.strip()]
+        if self._exists(self.classes_file):
+            classes = list(load_class_names(self.classes_file))
             print(f"Classes encontradas: {len(classes)}")
             for i, class_name in enumerate(classes):
                 print(f"  {i}: {class_name}")
@@ -29,7 +51,7 @@ class DatasetAnalyzer:
             return None
         
         # Verificar notas
-        if os.path.exists(self.notes_file):
+        if self._exists(self.notes_file):
             with open(self.notes_file, 'r', encoding='utf-8') as f:
                 notes = json.load(f)
             print(f"\nNotas do dataset:")
@@ -38,12 +60,11 @@ class DatasetAnalyzer:
             print(f"  Contribuidor: {notes.get('info', {}).get('contributor', 'N/A')}")
         
         # Analisar imagens
-        image_files = [f for f in os.listdir(self.images_path) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+        image_files = self._list_images()
         print(f"\nTotal de imagens: {len(image_files)}")
         
         # Analisar labels
-        if os.path.exists(self.labels_path):
+        if self._exists(self.labels_path):
             label_files = [f for f in os.listdir(self.labels_path) 
                           if f.endswith('.txt')]
             print(f"Total de labels: {len(label_files)}")
@@ -83,12 +104,10 @@ class DatasetAnalyzer:
     
     def get_dataset_stats(self):
         """Retorna estatísticas do dataset"""
-        image_files = [f for f in os.listdir(self.images_path) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+        image_files = self._list_images()
         
         # Carregar classes
-        with open(self.classes_file, 'r', encoding='utf-8') as f:
-            classes = [line.strip() for line in f.readlines() if line.strip()]
+        classes = list(load_class_names(self.classes_file))
         
         return {
             'num_images': len(image_files),
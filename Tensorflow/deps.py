@@ -0,0 +1,92 @@
+import functools
+import sys
+from importlib import metadata
+
+# packaging é opcional: sem ele só a presença do pacote é verificada
+try:
+    from packaging.requirements import Requirement
+except ImportError:
+    Requirement = None
+
+# Dependências do projeto: fonte única para requirements.txt, para o
+# instalador e para a verificação antes do treinamento
+DEPENDENCIES = (
+    "tensorflow>=2.10.0",
+    "opencv-python>=4.5.0",
+    "numpy>=1.21.0",
+    "matplotlib>=3.5.0",
+    "scikit-learn>=1.0.0",
+    "Pillow>=8.0.0",
+)
+
+# Distribuições alternativas que fornecem o mesmo módulo (a checagem por
+# import aceitava qualquer uma delas)
+DISTRIBUTION_ALIASES = {
+    "tensorflow": ("tensorflow", "tensorflow-cpu", "tensorflow-gpu",
+                   "tensorflow-macos", "tensorflow-intel"),
+    "opencv-python": ("opencv-python", "opencv-python-headless",
+                      "opencv-contrib-python", "opencv-contrib-python-headless"),
+}
+
+def installed_version(package_name):
+    """
+    Retorna a versão instalada de um pacote lendo apenas os metadados
+    (sem importá-lo), ou None se não estiver instalado
+    """
+    for dist in DISTRIBUTION_ALIASES.get(package_name, (package_name,)):
+        try:
+            return metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+def check_requirement(spec):
+    """
+    Verifica um especificador (ex: "numpy>=1.21.0") contra os metadados
+    instalados
+    
+    Returns:
+        tuple: (nome, versão instalada ou None, se o especificador é satisfeito)
+    """
+    if Requirement is None:
+        name = spec.split(">=")[0]
+        version = installed_version(name)
+        return name, version, version is not None
+    
+    requirement = Requirement(spec)
+    version = installed_version(requirement.name)
+    if version is None:
+        return requirement.name, None, False
+    return requirement.name, version, requirement.specifier.contains(version, prereleases=True)
+
+@functools.lru_cache(maxsize=1)
+def check_dependencies():
+    """
+    Verifica se as dependências estão instaladas. O resultado é memorizado:
+    chamadas seguintes no mesmo processo não repetem a verificação
+    """
+    # Relatório montado em memória e escrito de uma vez
+    lines = ["=== VERIFICAÇÃO DE DEPENDÊNCIAS ==="]
+    missing = []
+    
+    # Consulta os metadados instalados (dist-info) sem importar os pacotes:
+    # importar o tensorflow só para checar a presença custa segundos
+    for version_info in DEPENDENCIES:
+        package, version, satisfied = check_requirement(version_info)
+        if satisfied:
+            lines.append(f"✓ {package}: {version}")
+        elif version is not None:
+            lines.append(f"✗ {package} {version} não satisfaz {version_info}")
+            missing.append(version_info)
+        else:
+            lines.append(f"✗ {package} não encontrado")
+            missing.append(version_info)
+    
+    if missing:
+        lines.append("\nDependências faltando:")
+        lines.extend(f"  pip install {dep}" for dep in missing)
+    else:
+        lines.append("Todas as dependências estão instaladas!")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
+    return not missing
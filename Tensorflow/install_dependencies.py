@@ -1,102 +1,122 @@
 import subprocess
 import sys
 import os
+from deps import DEPENDENCIES, check_requirement
 
-def install_package(package):
-    """Instala um pacote usando pip"""
+# Cache persistente do pip (o wheel do tensorflow tem ~500 MB); pode ser
+# sobrescrito pela variável de ambiente PIP_CACHE_DIR
+PIP_CACHE_DIR = os.environ.get("PIP_CACHE_DIR",
+                                os.path.expanduser("~/.cache/pip_tf_installer"))
+WHEELHOUSE_DIR = "wheels"
+
+SEP = "=" * 60
+
+def _pip_command(action, *args):
+    """Monta a linha de comando do pip com as flags não interativas"""
+    os.makedirs(PIP_CACHE_DIR, exist_ok=True)
+    return [sys.executable, "-m", "pip", action,
+            "--no-input", "--disable-pip-version-check",
+            "--cache-dir", PIP_CACHE_DIR, *args]
+
+def create_wheelhouse(requirements_file="requirements.txt", wheelhouse=WHEELHOUSE_DIR):
+    """
+    Baixa os wheels das dependências para uma pasta local, permitindo
+    reinstalações sem acesso à rede
+    """
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+        subprocess.check_call(_pip_command("download", "--prefer-binary",
+                                           "-d", wheelhouse, "-r", requirements_file))
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Erro ao instalar {package}: {e}")
+        print(f"Erro ao criar wheelhouse: {e}")
+        return False
+
+def install_package(packages):
+    """
+    Instala pacotes usando uma única chamada ao pip
+    
+    Args:
+        packages: Especificador ou lista de especificadores (ex: "numpy>=1.21.0")
+    """
+    if isinstance(packages, str):
+        packages = [packages]
+    
+    cmd = _pip_command("install", "--prefer-binary", *packages)
+    
+    # Preferir o wheelhouse local quando existir
+    if os.path.isdir(WHEELHOUSE_DIR) and os.listdir(WHEELHOUSE_DIR):
+        try:
+            subprocess.check_call(cmd + ["--no-index", "--find-links", WHEELHOUSE_DIR])
+            return True
+        except subprocess.CalledProcessError:
+            print("Wheelhouse incompleto, instalando a partir do índice...")
+    
+    try:
+        subprocess.check_call(cmd)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Erro ao instalar {' '.join(packages)}: {e}")
         return False
 
 def check_and_install_dependencies():
     """Verifica e instala dependências necessárias"""
     print("=== INSTALAÇÃO DE DEPENDÊNCIAS ===")
     
-    # Lista de dependências
-    dependencies = [
-        "tensorflow>=2.10.0",
-        "opencv-python>=4.5.0", 
-        "numpy>=1.21.0",
-        "matplotlib>=3.5.0",
-        "scikit-learn>=1.0.0",
-        "Pillow>=8.0.0"
-    ]
-    
     print("Verificando e instalando dependências necessárias...")
     
-    for package in dependencies:
-        package_name = package.split(">=")[0]
+    missing = []
+    for package in DEPENDENCIES:
+        # Verificar pelos metadados instalados, sem importar o pacote, e
+        # conferir se a versão satisfaz o especificador
+        package_name, version, satisfied = check_requirement(package)
+        if satisfied:
+            print(f"✓ {package_name} já está instalado - versão {version}")
+        elif version is not None:
+            print(f"⚠ {package_name} {version} não satisfaz {package}")
+            missing.append(package)
+        else:
+            print(f"⚠ {package_name} não encontrado")
+            missing.append(package)
+    
+    # Uma única chamada ao pip para todos os pacotes faltantes
+    if missing:
+        print(f"\nInstalando {len(missing)} pacote(s): {' '.join(missing)}")
         
-        try:
-            # Tentar importar o pacote
-            if package_name == "opencv-python":
-                import cv2
-                print(f"✓ {package_name} já está instalado")
-            elif package_name == "tensorflow":
-                import tensorflow as tf
-                print(f"✓ {package_name} já está instalado - versão {tf.__version__}")
-            elif package_name == "numpy":
-                import numpy as np
-                print(f"✓ {package_name} já está instalado")
-            elif package_name == "matplotlib":
-                import matplotlib
-                print(f"✓ {package_name} já está instalado")
-            elif package_name == "scikit-learn":
-                import sklearn
-                print(f"✓ {package_name} já está instalado")
-            elif package_name == "Pillow":
-                from PIL import Image
-                print(f"✓ {package_name} já está instalado")
-                
-        except ImportError:
-            print(f"⚠ {package_name} não encontrado. Instalando...")
-            
-            if install_package(package):
-                print(f"✓ {package_name} instalado com sucesso")
-            else:
-                print(f"✗ Falha ao instalar {package_name}")
-                return False
+        if install_package(missing):
+            print("✓ Pacotes instalados com sucesso")
+        else:
+            print("✗ Falha ao instalar dependências")
+            return False
     
     print("\n✓ Todas as dependências estão instaladas!")
     return True
 
 def create_requirements_file():
     """Cria arquivo requirements.txt"""
-    requirements = [
-        "tensorflow>=2.10.0",
-        "opencv-python>=4.5.0",
-        "numpy>=1.21.0", 
-        "matplotlib>=3.5.0",
-        "scikit-learn>=1.0.0",
-        "Pillow>=8.0.0"
-    ]
-    
     with open("requirements.txt", "w") as f:
-        for req in requirements:
-            f.write(req + "\n")
+        f.write("\n".join(DEPENDENCIES) + "\n")
     
     print("Arquivo requirements.txt criado!")
+    print(f"Cache do pip: {PIP_CACHE_DIR} (defina PIP_CACHE_DIR para alterar)")
+    print(f"Para instalação offline: pip download -d {WHEELHOUSE_DIR} -r requirements.txt")
 
 def main():
     """Função principal"""
     print("INSTALADOR DE DEPENDÊNCIAS - MODELO TENSORFLOW LITE")
-    print("=" * 60)
+    print(SEP)
     
     # Criar arquivo requirements.txt
     create_requirements_file()
     
     # Instalar dependências
     if check_and_install_dependencies():
-        print("\n" + "=" * 60)
+        print("\n" + SEP)
         print("INSTALAÇÃO CONCLUÍDA COM SUCESSO!")
         print("\nVocê pode agora executar:")
         print("  python main.py")
         print("\nPara treinar e criar seu modelo TensorFlow Lite.")
     else:
-        print("\n" + "=" * 60)
+        print("\n" + SEP)
         print("ERRO NA INSTALAÇÃO")
         print("\nTente instalar manualmente:")
         print("  pip install -r requirements.txt")
@@ -1,18 +1,56 @@
 import os
 import numpy as np
 
+def export_saved_model(model, saved_model_dir):
+    """
+    Exporta `model` como SavedModel só de inferência (a conversão TFLite lê
+    o grafo direto, sem reconstruir o modelo Keras)
+    """
+    if hasattr(model, 'export'):
+        model.export(saved_model_dir)
+    else:
+        import tensorflow as tf
+        tf.saved_model.save(model, saved_model_dir)
+    print(f"SavedModel exportado em: {saved_model_dir}")
+
 class ThaiIDModel:
-    def __init__(self, num_classes=3, input_shape=(224, 224, 3)):
+    def __init__(self, num_classes=3, input_shape=(224, 224, 3), hvd=None):
+        """
+        Args:
+            hvd: Módulo horovod.tensorflow.keras já inicializado, para treino
+                distribuído (otimizador com allreduce dos gradientes)
+        """
         self.num_classes = num_classes
         self.input_shape = input_shape
+        self.hvd = hvd
         self.model = None
+        self.jit_compile = False
+        self.sparse = False
+    
+    def _apply_precision_policy(self, tf, mixed_precision):
+        """
+        Política global de precisão do Keras, definida antes de criar as
+        camadas. mixed_float16 só com GPU (em CPU o float16 é mais lento que
+        float32); sem ela volta para float32, para um modelo anterior não
+        deixar a política ligada. O compile envolve o otimizador num
+        LossScaleOptimizer automaticamente sob mixed_float16
+        """
+        if mixed_precision and tf.config.list_physical_devices('GPU'):
+            tf.keras.mixed_precision.set_global_policy('mixed_float16')
+            print("Mixed precision: mixed_float16")
+        else:
+            if mixed_precision:
+                print("Mixed precision ignorada: nenhuma GPU encontrada")
+            tf.keras.mixed_precision.set_global_policy('float32')
     
-    def create_mobilenetv2_model(self, alpha=1.0):
+    def create_mobilenetv2_model(self, alpha=1.0, mixed_precision=False):
         """
         Cria modelo baseado em MobileNetV2 (otimizado para mobile)
         
         Args:
             alpha: Controla a largura da rede (0.5, 0.75, 1.0, 1.25, 1.4)
+            mixed_precision: Usa a política global 'mixed_float16' (tensor cores);
+                só tem efeito com GPU disponível
         """
         try:
             import tensorflow as tf
@@ -26,6 +64,8 @@ class ThaiIDModel:
         print(f"Input shape: {self.input_shape}")
         print(f"Alpha: {alpha}")
         
+        self._apply_precision_policy(tf, mixed_precision)
+        
         # Base model pré-treinada
         base_model = tf.keras.applications.MobileNetV2(
             input_shape=self.input_shape,
@@ -40,24 +80,31 @@ class ThaiIDModel:
         print(f"Base model criado com {len(base_model.layers)} camadas")
         print(f"Parâmetros treináveis: {base_model.count_params()}")
         
-        # Adiciona camadas personalizadas
-        self.model = models.Sequential([
-            base_model,
-            layers.GlobalAveragePooling2D(),
-            layers.Dropout(0.2),
-            layers.Dense(128, activation='relu', name='feature_layer'),
-            layers.Dropout(0.2),
-            layers.Dense(self.num_classes, activation='softmax', name='predictions')
-        ])
+        # API funcional: a base roda sempre em modo de inferência (BN com
+        # estatísticas congeladas, também no fine-tuning) e o grafo é um só.
+        # Cabeça: Conv 1x1 sobre o mapa da base (funde com o backbone no
+        # TFLite/XLA) antes do pooling, no lugar de GAP -> Dense(128)
+        inputs = tf.keras.Input(shape=self.input_shape)
+        x = base_model(inputs, training=False)
+        x = layers.Conv2D(128, 1, activation='relu', name='feature_layer')(x)
+        x = layers.GlobalAveragePooling2D()(x)
+        x = layers.Dropout(0.2)(x)
+        # Saída sempre em float32 para um softmax numericamente estável
+        outputs = layers.Dense(self.num_classes, activation='softmax', dtype='float32',
+                               name='predictions')(x)
+        self.model = models.Model(inputs, outputs)
         
         print("Camadas personalizadas adicionadas")
         print(f"Total de parâmetros: {self.model.count_params()}")
         
         return self.model
     
-    def create_custom_cnn(self):
+    def create_custom_cnn(self, mixed_precision=False):
         """
         Cria CNN personalizada e leve para dispositivos móveis
+        
+        Args:
+            mixed_precision: Ver create_mobilenetv2_model
         """
         try:
             import tensorflow as tf
@@ -68,25 +115,33 @@ class ThaiIDModel:
         
         print("=== CRIANDO MODELO CNN PERSONALIZADO ===")
         
+        self._apply_precision_policy(tf, mixed_precision)
+        
+        # Blocos Conv -> BN -> ReLU (sem bias na conv): o BN pode ser dobrado
+        # nos pesos da convolução para inferência (ver fuse_bn)
         self.model = models.Sequential([
             # Primeira camada conv
-            layers.Conv2D(32, (3, 3), activation='relu', input_shape=self.input_shape),
+            layers.Conv2D(32, (3, 3), use_bias=False, input_shape=self.input_shape),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Segunda camada conv
-            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.Conv2D(64, (3, 3), use_bias=False),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Terceira camada conv
-            layers.Conv2D(128, (3, 3), activation='relu'),
+            layers.Conv2D(128, (3, 3), use_bias=False),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Quarta camada conv (opcional para mais profundidade)
-            layers.Conv2D(128, (3, 3), activation='relu'),
+            layers.Conv2D(128, (3, 3), use_bias=False),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Flatten e Dense layers
@@ -94,7 +149,7 @@ class ThaiIDModel:
             layers.Dropout(0.5),
             layers.Dense(512, activation='relu'),
             layers.Dropout(0.3),
-            layers.Dense(self.num_classes, activation='softmax')
+            layers.Dense(self.num_classes, activation='softmax', dtype='float32')
         ])
         
         print(f"Modelo CNN criado com {len(self.model.layers)} camadas")
@@ -102,9 +157,12 @@ class ThaiIDModel:
         
         return self.model
     
-    def create_lightweight_model(self):
+    def create_lightweight_model(self, mixed_precision=False):
         """
         Cria um modelo ultra-leve para dispositivos com recursos limitados
+        
+        Args:
+            mixed_precision: Ver create_mobilenetv2_model
         """
         try:
             import tensorflow as tf
@@ -115,20 +173,26 @@ class ThaiIDModel:
         
         print("=== CRIANDO MODELO ULTRA-LEVE ===")
         
+        self._apply_precision_policy(tf, mixed_precision)
+        
+        # Blocos Conv -> BN -> ReLU, dobráveis com fuse_bn
         self.model = models.Sequential([
             # Primeira camada com filtros pequenos
-            layers.Conv2D(16, (3, 3), activation='relu', input_shape=self.input_shape),
+            layers.Conv2D(16, (3, 3), use_bias=False, input_shape=self.input_shape),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Segunda camada
-            layers.Conv2D(32, (3, 3), activation='relu'),
+            layers.Conv2D(32, (3, 3), use_bias=False),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Terceira camada
-            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.Conv2D(64, (3, 3), use_bias=False),
             layers.BatchNormalization(),
+            layers.ReLU(),
             layers.MaxPooling2D((2, 2)),
             
             # Global Average Pooling para reduzir parâmetros
@@ -136,16 +200,24 @@ class ThaiIDModel:
             layers.Dropout(0.3),
             layers.Dense(64, activation='relu'),
             layers.Dropout(0.2),
-            layers.Dense(self.num_classes, activation='softmax')
+            layers.Dense(self.num_classes, activation='softmax', dtype='float32')
         ])
         
         print(f"Modelo ultra-leve criado com {self.model.count_params()} parâmetros")
         
         return self.model
     
-    def compile_model(self, learning_rate=0.001, metrics=['accuracy']):
+    def compile_model(self, learning_rate=0.001, metrics=['accuracy'], jit_compile=None,
+                      accum_steps=1):
         """
         Compila o modelo com otimizador e loss function
+        
+        Args:
+            jit_compile: Compila o passo de treino com XLA (funde BN/ReLU/dropout
+                em menos kernels). Pode piorar algumas convs na GPU: medir antes.
+                None mantém a escolha da compilação anterior
+            accum_steps: Acumula os gradientes de N lotes antes de cada
+                atualização (lote efetivo N vezes maior, mesma memória)
         """
         if self.model is None:
             print("Erro: Modelo não foi criado ainda!")
@@ -157,13 +229,146 @@ class ThaiIDModel:
             print("TensorFlow não está instalado!")
             return False
         
+        if jit_compile is not None:
+            self.jit_compile = jit_compile
+        
+        if self.hvd is None:
+            optimizer = None
+            if accum_steps > 1:
+                try:
+                    optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate,
+                                                         gradient_accumulation_steps=accum_steps)
+                except (TypeError, ValueError):
+                    # Keras 2: o otimizador não acumula gradientes
+                    print("Acumulação de gradientes indisponível nesta versão do Keras")
+                    accum_steps = 1
+            if optimizer is None:
+                optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
+        else:
+            # Lote efetivo N vezes maior: learning rate escalado pelo número
+            # de processos e gradientes médios via allreduce (a cada
+            # accum_steps lotes locais)
+            optimizer = self.hvd.DistributedOptimizer(
+                tf.keras.optimizers.Adam(learning_rate=learning_rate * self.hvd.size()),
+                backward_passes_per_step=accum_steps)
+        
+        # jit_compile só é repassado quando ativo (Keras antigos não o aceitam)
+        options = {'jit_compile': True} if self.jit_compile else {}
         self.model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
-            loss='categorical_crossentropy',
-            metrics=metrics
+            optimizer=optimizer,
+            loss='sparse_categorical_crossentropy',
+            metrics=metrics,
+            **options
+        )
+        
+        print(f"Modelo compilado com learning_rate={learning_rate}"
+              + (" (XLA)" if self.jit_compile else "")
+              + (f", gradientes acumulados a cada {accum_steps} lotes" if accum_steps > 1 else ""))
+        return True
+    
+    def fuse_bn(self):
+        """
+        Retorna uma cópia do modelo para inferência com cada BatchNormalization
+        dobrado na Conv2D anterior: W' = W·γ/√(σ²+ε), b' = (b-μ)·γ/√(σ²+ε)+β.
+        Só pares Conv2D (sem ativação) -> BatchNormalization no nível do
+        Sequential são fundidos; sem nenhum par, o próprio modelo é retornado.
+        """
+        if self.model is None:
+            print("Erro: Modelo não foi criado ainda!")
+            return None
+        
+        try:
+            import tensorflow as tf
+            from tensorflow.keras import layers, models
+        except ImportError:
+            print("TensorFlow não está instalado!")
+            return None
+        
+        source = self.model.layers
+        fusable = {
+            i for i in range(len(source) - 1)
+            if isinstance(source[i], layers.Conv2D)
+            and source[i].get_config()['activation'] == 'linear'
+            and isinstance(source[i + 1], layers.BatchNormalization)
+            and tuple(np.atleast_1d(source[i + 1].axis)) in ((-1,), (3,))
+        }
+        if not fusable:
+            return self.model
+        
+        fused_layers = []
+        fused_weights = []
+        i = 0
+        while i < len(source):
+            layer = source[i]
+            config = layer.get_config()
+            config.pop('batch_input_shape', None)
+            
+            if i in fusable:
+                bn = source[i + 1]
+                kernel = layer.kernel.numpy()
+                bias = layer.bias.numpy() if layer.use_bias else 0.0
+                gamma = bn.gamma.numpy() if bn.scale else 1.0
+                beta = bn.beta.numpy() if bn.center else 0.0
+                
+                scale = gamma / np.sqrt(bn.moving_variance.numpy() + bn.epsilon)
+                config['use_bias'] = True
+                fused_layers.append(layers.Conv2D.from_config(config))
+                fused_weights.append([kernel * scale,
+                                      (bias - bn.moving_mean.numpy()) * scale + beta])
+                i += 2
+            else:
+                fused_layers.append(layer.__class__.from_config(config))
+                fused_weights.append(layer.get_weights())
+                i += 1
+        
+        fused = models.Sequential([tf.keras.Input(shape=self.input_shape)] + fused_layers)
+        for layer, weights in zip(fused.layers, fused_weights):
+            layer.set_weights(weights)
+        
+        print(f"BatchNorm fundido em {len(fusable)} convoluções")
+        return fused
+    
+    def enable_pruning(self, end_step, target_sparsity=0.5):
+        """
+        Envolve o modelo com poda por magnitude (tensorflow-model-optimization):
+        a esparsidade cresce de 0 até `target_sparsity` entre o passo 0 e
+        `end_step`. O modelo precisa ser recompilado e treinado com o callback
+        UpdatePruningStep; depois chamar strip_pruning()
+        """
+        if self.model is None:
+            print("Erro: Modelo não foi criado ainda!")
+            return False
+        
+        try:
+            import tensorflow_model_optimization as tfmot
+        except ImportError:
+            print("tensorflow-model-optimization não está instalado!")
+            return False
+        
+        schedule = tfmot.sparsity.keras.PolynomialDecay(
+            initial_sparsity=0.0,
+            final_sparsity=target_sparsity,
+            begin_step=0,
+            end_step=end_step
         )
+        self.model = tfmot.sparsity.keras.prune_low_magnitude(self.model, pruning_schedule=schedule)
+        
+        print(f"Poda habilitada: esparsidade final {target_sparsity:.0%} em {end_step} passos")
+        return True
+    
+    def strip_pruning(self):
+        """
+        Remove os wrappers de poda, mantendo os pesos zerados. O export TFLite
+        passa a pedir kernels esparsos (delegate XNNPACK pula os MACs nulos)
+        """
+        try:
+            import tensorflow_model_optimization as tfmot
+        except ImportError:
+            print("tensorflow-model-optimization não está instalado!")
+            return False
         
-        print(f"Modelo compilado com learning_rate={learning_rate}")
+        self.model = tfmot.sparsity.keras.strip_pruning(self.model)
+        self.sparse = True
         return True
     
     def get_model_summary(self):
@@ -188,8 +393,20 @@ class ThaiIDModel:
         except:
             return "Erro ao gerar summary do modelo"
     
-    def save_model(self, filepath):
-        """Salva o modelo treinado"""
+    def save_model(self, filepath, quantize=None, representative_data=None, saved_model_dir=None):
+        """
+        Salva o modelo treinado
+        
+        Args:
+            filepath: Caminho do modelo Keras (.h5)
+            quantize: None, 'int8' ou 'fp16' para exportar também um .tflite
+                quantizado ao lado do .h5 (ex: modelo_int8.tflite)
+            representative_data: Amostras de treino (numpy array) para calibrar
+                a quantização int8
+            saved_model_dir: Diretório para exportar também um SavedModel só
+                de inferência, com o BatchNorm fundido (fuse_bn); a conversão
+                TFLite lê o grafo direto, sem reconstruir o modelo Keras
+        """
         if self.model is None:
             print("Erro: Modelo não foi criado ainda!")
             return False
@@ -197,10 +414,82 @@ class ThaiIDModel:
         try:
             self.model.save(filepath)
             print(f"Modelo salvo em: {filepath}")
-            return True
+            
+            if saved_model_dir is not None:
+                # SavedModel só de inferência: BatchNorm já dobrado nas
+                # convoluções (é dele que o pipeline converte para TFLite)
+                fused = self.fuse_bn()
+                export_saved_model(fused if fused is not None else self.model, saved_model_dir)
         except Exception as e:
             print(f"Erro ao salvar modelo: {e}")
             return False
+        
+        if quantize is not None:
+            return self.export_quantized_tflite(filepath, quantize, representative_data)
+        return True
+    
+    def export_quantized_tflite(self, filepath, quantize='int8', representative_data=None,
+                                num_calibration_samples=200):
+        """
+        Exporta o modelo para TFLite com quantização pós-treinamento
+        
+        Args:
+            filepath: Caminho base (.h5); o .tflite recebe o sufixo _<quantize>
+            quantize: 'int8' (pesos e ativações int8, entrada/saída int8; CPU)
+                ou 'fp16' (pesos float16, sem calibração; delegate de GPU)
+            representative_data: Amostras de treino para calibração (int8)
+            num_calibration_samples: Número máximo de amostras de calibração
+        """
+        try:
+            import tensorflow as tf
+        except ImportError:
+            print("TensorFlow não está instalado!")
+            return False
+        
+        # Converter a cópia com BN dobrado: a calibração int8 vê as
+        # convoluções já fundidas
+        converter = tf.lite.TFLiteConverter.from_keras_model(self.fuse_bn())
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if self.sparse:
+            converter.optimizations.append(tf.lite.Optimize.EXPERIMENTAL_SPARSITY)
+        
+        if quantize == 'int8':
+            if representative_data is None:
+                print("Erro: quantização int8 requer representative_data")
+                return False
+            
+            # Calibração sobre um buffer float32 contíguo (fatias sem cópia)
+            samples = np.ascontiguousarray(representative_data[:num_calibration_samples],
+                                           dtype=np.float32)
+            
+            def representative_dataset():
+                for i in range(len(samples)):
+                    yield [samples[i:i+1]]
+            
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+        elif quantize == 'fp16':
+            # Pesos em float16: metade do tamanho, executados nativamente
+            # pelo delegate de GPU (na CPU são expandidos para float32)
+            converter.target_spec.supported_types = [tf.float16]
+        else:
+            raise ValueError(f"Quantização não suportada: {quantize}")
+        
+        try:
+            tflite_model = converter.convert()
+        except Exception as e:
+            print(f"Erro na quantização {quantize}: {e}")
+            return False
+        
+        tflite_path = f"{os.path.splitext(filepath)[0]}_{quantize}.tflite"
+        with open(tflite_path, 'wb') as f:
+            f.write(tflite_model)
+        
+        print(f"Modelo TFLite {quantize} salvo em: {tflite_path} "
+              f"({len(tflite_model) / (1024 * 1024):.2f} MB)")
+        return True
     
     def load_model(self, filepath):
         """Carrega um modelo salvo"""
@@ -224,9 +513,10 @@ class ThaiIDModel:
         try:
             import tensorflow as tf
             
-            # Verificar se o modelo tem uma base pré-treinada
-            if len(self.model.layers) > 0 and hasattr(self.model.layers[0], 'layers'):
-                base_model = self.model.layers[0]
+            # Verificar se o modelo tem uma base pré-treinada (submodelo aninhado)
+            base_model = next((layer for layer in self.model.layers
+                               if isinstance(layer, tf.keras.Model)), None)
+            if base_model is not None:
                 base_model.trainable = True
                 
                 # Congelar camadas iniciais, treinar apenas as finais
@@ -1,5 +1,6 @@
+import os
+import zlib
 import numpy as np
-from sklearn.model_selection import train_test_split
 from collections import Counter
 
 class DataPreprocessor:
@@ -18,20 +19,29 @@ class DataPreprocessor:
         for class_id, count in zip(unique, counts):
             print(f"  Classe {class_id}: {count} amostras")
         
-        # Primeiro split: treino+val vs teste
-        X_temp, X_test, y_temp, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state, stratify=y
-        )
+        # Split estratificado só sobre índices: cada classe é embaralhada e
+        # fatiada nas proporções de teste/validação; X é indexado uma única
+        # vez por split no final (sem cópias intermediárias)
+        rng = np.random.default_rng(random_state)
+        train_idx, val_idx, test_idx = [], [], []
+        for class_id in unique:
+            idx = np.flatnonzero(y == class_id)
+            rng.shuffle(idx)
+            n_test = int(round(len(idx) * test_size))
+            n_val = int(round(len(idx) * val_size)) if val_size > 0 else 0
+            test_idx.append(idx[:n_test])
+            val_idx.append(idx[n_test:n_test + n_val])
+            train_idx.append(idx[n_test + n_val:])
         
-        # Segundo split: treino vs validação
+        train_idx, val_idx, test_idx = (rng.permutation(np.concatenate(parts))
+                                        for parts in (train_idx, val_idx, test_idx))
+        
+        X_train, y_train = X[train_idx], y[train_idx]
+        X_test, y_test = X[test_idx], y[test_idx]
         if val_size > 0:
-            val_size_adjusted = val_size / (1 - test_size)
-            X_train, X_val, y_train, y_val = train_test_split(
-                X_temp, y_temp, test_size=val_size_adjusted, 
-                random_state=random_state, stratify=y_temp
-            )
+            X_val, y_val = X[val_idx], y[val_idx]
         else:
-            X_train, X_val, y_train, y_val = X_temp, None, y_temp, None
+            X_val, y_val = None, None
         
         print(f"\nSplits criados:")
         print(f"  Treino: {len(X_train)} amostras")
@@ -55,60 +65,135 @@ class DataPreprocessor:
             percentage = (count / len(y)) * 100
             print(f"  Classe {class_id}: {count} ({percentage:.1f}%)")
     
-    def create_data_generators(self, X_train, y_train, X_val=None, y_val=None, 
-                             batch_size=32, num_classes=3):
+    def _cache_path(self, cache_dir, name, X, y):
+        """
+        Arquivo de cache do tf.data para um split. O nome inclui o shape e
+        um checksum dos dados, para um cache antigo nunca servir outro split
+        """
+        if cache_dir is None:
+            return ''
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        checksum = zlib.adler32(np.ascontiguousarray(y))
+        checksum = zlib.adler32(np.ascontiguousarray(X), checksum)
+        shape = 'x'.join(map(str, X.shape))
+        return os.path.join(cache_dir, f"{name}_{shape}_{checksum:08x}.tfcache")
+    
+    def create_tf_datasets(self, X_train, y_train, X_val=None, y_val=None,
+                           batch_size=32, num_classes=3, cache_dir=None, img_size=None,
+                           num_shards=1, shard_index=0):
         """
-        Cria geradores de dados com data augmentation usando tf.keras
+        Cria pipelines tf.data (cache + shuffle + batch + prefetch) para treino
+        e validação: a montagem dos lotes na CPU se sobrepõe ao passo do modelo.
+        Os labels ficam inteiros (int32) para a sparse_categorical_crossentropy
+        
+        O cache fica antes do shuffle e da augmentation (só a parte
+        determinística é guardada). Com `cache_dir`, vai para arquivos em
+        disco em vez da memória
+        
+        Imagens uint8 são mantidas em uint8 até o lote (4x menos bytes no
+        cache e na cópia para o device) e normalizadas para [0, 1] por lote,
+        antes da augmentation
+        
+        `X_train` também pode ser um array de caminhos (modo streaming): as
+        imagens são lidas, decodificadas e redimensionadas para `img_size`
+        (w, h) pelo próprio tf.data, sem materializar o conjunto na memória.
+        Os caminhos são embaralhados antes da decodificação; o cache só é
+        usado com `cache_dir` (em disco)
+        
+        Com `num_shards` > 1 (treino distribuído), o treino é fatiado logo
+        na origem: cada processo lê, decodifica e embaralha só a sua fração
+        `shard_index` das amostras, disjunta das demais
         """
         try:
             import tensorflow as tf
-            from tensorflow.keras.utils import to_categorical
-            from tensorflow.keras.preprocessing.image import ImageDataGenerator
         except ImportError:
-            print("TensorFlow não está instalado. Instalando...")
+            print("TensorFlow não está instalado!")
             return None
         
-        print("=== CRIANDO GERADORES DE DADOS ===")
+        print("=== CRIANDO PIPELINES TF.DATA ===")
         
-        # Converter labels para categorical
-        y_train_cat = to_categorical(y_train, num_classes)
-        y_val_cat = to_categorical(y_val, num_classes) if y_val is not None else None
+        AUTOTUNE = tf.data.AUTOTUNE
         
-        print(f"Labels convertidas para categorical: {y_train_cat.shape}")
+        y_train = np.asarray(y_train, dtype=np.int32)
+        train_source = tf.data.Dataset.from_tensor_slices((X_train, y_train))
+        train_cache = 'train'
+        num_train = len(X_train) // num_shards
+        if num_shards > 1:
+            # Frações do mesmo tamanho: todos os processos fazem o mesmo
+            # número de passos (o allreduce não espera por um lote a mais)
+            train_source = (train_source.take(num_train * num_shards)
+                            .shard(num_shards, shard_index))
+            train_cache = f'train_{shard_index}of{num_shards}'
         
-        if self.augment:
-            # Data Augmentation para treino
-            train_datagen = ImageDataGenerator(
-                rotation_range=20,
-                width_shift_range=0.1,
-                height_shift_range=0.1,
-                horizontal_flip=True,
-                zoom_range=0.1,
-                brightness_range=[0.8, 1.2],
-                fill_mode='nearest'
-            )
-            print("Data augmentation ativado para treino")
+        if X_train.dtype.kind in ('U', 'S', 'O'):
+            target_size = (img_size[1], img_size[0])
+            
+            def decode(path, y):
+                image = tf.io.decode_image(tf.io.read_file(path), channels=3,
+                                           expand_animations=False)
+                image = tf.image.resize(image, target_size, method='area')
+                return image * (1.0 / 255.0), y
+            
+            if cache_dir is None:
+                train_ds = (train_source.shuffle(num_train)
+                            .map(decode, num_parallel_calls=AUTOTUNE))
+            else:
+                train_ds = (train_source.map(decode, num_parallel_calls=AUTOTUNE)
+                            .cache(self._cache_path(cache_dir, train_cache, X_train, y_train))
+                            .shuffle(min(num_train, 1024)))
+            train_ds = train_ds.batch(batch_size)
         else:
-            train_datagen = ImageDataGenerator()
-            print("Data augmentation desativado")
+            train_ds = (train_source
+                        .cache(self._cache_path(cache_dir, train_cache, X_train, y_train))
+                        .shuffle(num_train)
+                        .batch(batch_size))
+        
+        def normalize(x, y):
+            return tf.cast(x, tf.float32) * (1.0 / 255.0), y
+        
+        if X_train.dtype == np.uint8:
+            train_ds = train_ds.map(normalize, num_parallel_calls=AUTOTUNE)
         
-        # Gerador para validação (sem augmentation)
-        val_datagen = ImageDataGenerator()
+        if self.augment:
+            # Transformações geométricas (reamostragem) sobre o lote inteiro
+            geometric = tf.keras.Sequential([
+                tf.keras.layers.RandomRotation(20 / 360, fill_mode='nearest'),
+                tf.keras.layers.RandomTranslation(0.1, 0.1, fill_mode='nearest'),
+                tf.keras.layers.RandomZoom(0.1, fill_mode='nearest'),
+            ])
+            
+            def augment(x, y):
+                x = geometric(x, training=True)
+                # Flip horizontal, contraste e brilho sorteados por imagem e
+                # aplicados numa única expressão elementwise (um só map)
+                shape = [tf.shape(x)[0], 1, 1, 1]
+                flip = tf.random.uniform(shape) < 0.5
+                x = tf.where(flip, tf.reverse(x, axis=[2]), x)
+                mean = tf.reduce_mean(x, axis=[1, 2], keepdims=True)
+                contrast = tf.random.uniform(shape, 0.8, 1.2)
+                brightness = tf.random.uniform(shape, -0.2, 0.2)
+                x = (x - mean) * contrast + mean + brightness
+                return tf.clip_by_value(x, 0.0, 1.0), y
+            
+            train_ds = train_ds.map(augment, num_parallel_calls=AUTOTUNE)
+            print("Data augmentation ativado para treino")
         
-        # Criar geradores
-        train_generator = train_datagen.flow(
-            X_train, y_train_cat, batch_size=batch_size, shuffle=True
-        )
+        train_ds = train_ds.prefetch(AUTOTUNE)
         
-        val_generator = None
+        val_ds = None
         if X_val is not None and y_val is not None:
-            val_generator = val_datagen.flow(
-                X_val, y_val_cat, batch_size=batch_size, shuffle=False
-            )
+            y_val = np.asarray(y_val, dtype=np.int32)
+            val_ds = (tf.data.Dataset.from_tensor_slices((X_val, y_val))
+                      .cache(self._cache_path(cache_dir, 'val', X_val, y_val))
+                      .batch(batch_size))
+            if X_val.dtype == np.uint8:
+                val_ds = val_ds.map(normalize, num_parallel_calls=AUTOTUNE)
+            val_ds = val_ds.prefetch(AUTOTUNE)
         
-        print(f"Geradores criados com batch_size={batch_size}")
+        print(f"Pipelines criados com batch_size={batch_size}")
         
-        return train_generator, val_generator, (y_train_cat, y_val_cat)
+        return train_ds, val_ds
     
     def balance_dataset(self, X, y, strategy='undersample'):
         """
@@ -121,66 +206,55 @@ class DataPreprocessor:
         for class_id, count in zip(unique, counts):
             print(f"  Classe {class_id}: {count} amostras")
         
-        if strategy == 'undersample':
-            # Undersample: reduzir para o tamanho da menor classe
-            min_count = np.min(counts)
-            print(f"\nUsando undersample para {min_count} amostras por classe")
+        if strategy in ('undersample', 'oversample'):
+            if strategy == 'undersample':
+                # Undersample: reduzir para o tamanho da menor classe
+                target = np.min(counts)
+                print(f"\nUsando undersample para {target} amostras por classe")
+            else:
+                # Oversample: aumentar para o tamanho da maior classe
+                target = np.max(counts)
+                print(f"\nUsando oversample para {target} amostras por classe")
             
-            balanced_X = []
-            balanced_y = []
+            # Índices sorteados por classe e embaralhados; as imagens são
+            # copiadas uma única vez, num gather vetorizado
+            balanced_indices = np.concatenate([
+                np.random.choice(np.flatnonzero(y == class_id), target,
+                                 replace=(strategy == 'oversample'))
+                for class_id in unique
+            ])
+            np.random.shuffle(balanced_indices)
             
-            for class_id in unique:
-                class_indices = np.where(y == class_id)[0]
-                selected_indices = np.random.choice(class_indices, min_count, replace=False)
-                
-                balanced_X.extend(X[selected_indices])
-                balanced_y.extend(y[selected_indices])
-            
-            X_balanced = np.array(balanced_X)
-            y_balanced = np.array(balanced_y)
-            
-        elif strategy == 'oversample':
-            # Oversample: aumentar para o tamanho da maior classe
-            max_count = np.max(counts)
-            print(f"\nUsando oversample para {max_count} amostras por classe")
-            
-            balanced_X = []
-            balanced_y = []
-            
-            for class_id in unique:
-                class_indices = np.where(y == class_id)[0]
-                selected_indices = np.random.choice(class_indices, max_count, replace=True)
-                
-                balanced_X.extend(X[selected_indices])
-                balanced_y.extend(y[selected_indices])
-            
-            X_balanced = np.array(balanced_X)
-            y_balanced = np.array(balanced_y)
-        
-        else:
-            # Manter original
-            X_balanced, y_balanced = X, y
-        
-        # Embaralhar dados balanceados
-        if strategy != 'none':
-            shuffle_indices = np.random.permutation(len(X_balanced))
-            X_balanced = X_balanced[shuffle_indices]
-            y_balanced = y_balanced[shuffle_indices]
+            X_balanced = X[balanced_indices]
+            y_balanced = y[balanced_indices]
             
             print("Distribuição após balanceamento:")
             unique_bal, counts_bal = np.unique(y_balanced, return_counts=True)
             for class_id, count in zip(unique_bal, counts_bal):
                 print(f"  Classe {class_id}: {count} amostras")
         
+        else:
+            # Manter original
+            X_balanced, y_balanced = X, y
+        
         return X_balanced, y_balanced
     
     def normalize_images(self, X):
-        """Normaliza as imagens para o range [0, 1]"""
-        if X.dtype != np.float32:
-            X = X.astype(np.float32)
-        
-        if np.max(X) > 1.0:
-            X = X / 255.0
+        """
+        Normaliza as imagens para o range [0, 1]. Arrays float32 são
+        normalizados in-place; uint8 é convertido e escalado numa única passada
+        """
+        if X.dtype == np.uint8:
+            # Conversão e divisão fundidas num único ufunc, sem cópia intermediária
+            out = np.empty(X.shape, dtype=np.float32)
+            np.multiply(X, np.float32(1.0 / 255.0), out=out)
+            X = out
+        else:
+            if X.dtype != np.float32:
+                X = X.astype(np.float32)
+            
+            if np.max(X) > 1.0:
+                np.multiply(X, np.float32(1.0 / 255.0), out=X)
         
         print(f"Imagens normalizadas: min={X.min():.3f}, max={X.max():.3f}")
         return X
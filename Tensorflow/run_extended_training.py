@@ -12,8 +12,9 @@ from pathlib import Path
 # Adicionar o diretório atual ao path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from data_loader import list_image_files
 from main_extended import main_extended_training
-from inference import ThaiIDInference
+from inference import get_inference
 
 def main():
     """Função principal para execução do treinamento estendido"""
@@ -53,8 +54,7 @@ def main():
         return False
     
     # Contar arquivos
-    image_files = [f for f in os.listdir(images_path) 
-                   if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+    image_files = list_image_files(images_path)
     label_files = [f for f in os.listdir(labels_path) 
                    if f.endswith('.txt')]
     
@@ -131,8 +131,8 @@ def test_model_quickly():
         
         print(f"   📱 Testando modelo: {model_path}")
         
-        # Carregar modelo
-        inference = ThaiIDInference(model_path)
+        # Carregar modelo (interpretador compartilhado entre teste e benchmark)
+        inference = get_inference(model_path)
         
         # Teste com algumas imagens
         inference.test_with_dataset(max_images=5)
@@ -156,8 +156,8 @@ def benchmark_model_speed():
         
         print(f"   ⚡ Benchmark do modelo: {model_path}")
         
-        # Carregar modelo
-        inference = ThaiIDInference(model_path)
+        # Carregar modelo (interpretador compartilhado entre teste e benchmark)
+        inference = get_inference(model_path)
         
         # Benchmark
         results = inference.benchmark_inference_speed(num_iterations=50)
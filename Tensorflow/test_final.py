@@ -10,7 +10,20 @@ from tensorflow import keras
 import cv2
 import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import json
+from data_loader import list_image_files, TF_DECODE_EXTENSIONS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps_line(record):
+    """Serializa um registro como linha JSONL (bytes), com orjson se disponível"""
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record).encode('utf-8') + b"\n"
 
 def load_classes(classes_file="dataset/classes.txt"):
     """Carrega as classes do arquivo"""
@@ -20,29 +33,40 @@ def load_classes(classes_file="dataset/classes.txt"):
     return ['card', 'national_id', 'religion']
 
 def preprocess_image(image_path, target_size=(224, 224)):
-    """Preprocessa uma imagem para inferência"""
+    """Preprocessa uma imagem para inferência (H, W, 3), sem dimensão de batch"""
     try:
         image = cv2.imread(image_path)
         if image is None:
             return None
         
-        # Converter BGR para RGB
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        
-        # Redimensionar
-        image = cv2.resize(image, target_size)
+        # Redimensionar e converter BGR para RGB (view, sem cópia extra)
+        image = cv2.resize(image, target_size)[..., ::-1]
         
         # Normalizar
-        image = image.astype(np.float32) / 255.0
-        
-        # Adicionar dimensão do batch
-        image = np.expand_dims(image, axis=0)
-        
-        return image
+        return image.astype(np.float32) / 255.0
     except Exception as e:
         print(f"Erro ao processar {image_path}: {e}")
         return None
 
+def create_test_dataset(image_paths, target_size=(224, 224), batch_size=32):
+    """
+    Pipeline tf.data de teste: leitura, decodificação (já em RGB), resize e
+    normalização como ops do TF em paralelo, com prefetch sobrepondo I/O e inferência
+    
+    Gera lotes (índices em `image_paths`, imagens): arquivos corrompidos ou
+    ilegíveis são descartados (ignore_errors) em vez de abortar o teste, e
+    os índices dizem quais imagens sobraram
+    """
+    def load(index, path):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        return index, tf.image.resize(image, target_size) / 255.0
+    
+    return (tf.data.Dataset.from_tensor_slices((np.arange(len(image_paths)), image_paths))
+            .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+            .ignore_errors()
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE))
+
 def test_model_comprehensive():
     """Teste compreensivo do modelo treinado"""
     print("=" * 60)
@@ -55,6 +79,12 @@ def test_model_comprehensive():
         print(f"❌ Modelo não encontrado: {model_path}")
         return
     
+    # Inferência Keras em CPU: um pool intra-op com todos os núcleos para os
+    # GEMMs/convs e poucos ops independentes em paralelo (grafo sequencial).
+    # Precisa ser configurado antes da primeira op do TensorFlow
+    tf.config.threading.set_intra_op_parallelism_threads(os.cpu_count())
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+    
     print(f"📁 Carregando modelo: {model_path}")
     model = keras.models.load_model(model_path)
     
@@ -69,58 +99,98 @@ def test_model_comprehensive():
         return
     
     # Obter todas as imagens
-    image_files = [f for f in os.listdir(dataset_path) 
-                   if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+    image_files = list_image_files(dataset_path)
     
     print(f"🖼️ Imagens encontradas: {len(image_files)}")
     
     # Testar todas as imagens
-    results = []
     correct_predictions = 0
     total_predictions = 0
-    times = []
+    
+    # Função concreta traçada uma única vez para qualquer tamanho de lote
+    @tf.function(input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32)])
+    def infer(x):
+        return model(x, training=False)
+    
+    # Máximo 30 imagens: as decodificáveis pelo TF vão pelo pipeline tf.data,
+    # o restante pelo OpenCV (predições guardadas na posição original)
+    test_files = image_files[:30]
+    tf_rows = [i for i, f in enumerate(test_files)
+               if os.path.splitext(f)[1].lower() in TF_DECODE_EXTENSIONS]
+    tf_row_set = set(tf_rows)
+    predictions = np.empty((len(test_files), len(classes)), dtype=np.float32)
+    valid_rows = []
+    
+    start_time = time.time()
+    if tf_rows:
+        tf_paths = [os.path.join(dataset_path, test_files[i]) for i in tf_rows]
+        for indices, batch in create_test_dataset(tf_paths):
+            rows = [tf_rows[j] for j in indices.numpy()]
+            predictions[rows] = infer(batch).numpy()
+            valid_rows.extend(rows)
+        
+        dropped = sorted(set(tf_rows) - set(valid_rows))
+        if dropped:
+            print(f"⚠️ {len(dropped)} imagens não decodificadas (ignoradas): "
+                  f"{', '.join(test_files[i] for i in dropped)}")
+    
+    # Decode/resize do OpenCV liberam o GIL: threads escalam com os núcleos
+    other_rows = [i for i in range(len(test_files)) if i not in tf_row_set]
+    cv_rows = []
+    cv_batch = np.empty((len(other_rows), 224, 224, 3), dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        processed = executor.map(preprocess_image,
+                                 [os.path.join(dataset_path, test_files[i]) for i in other_rows])
+        for i, processed_img in zip(other_rows, processed):
+            if processed_img is None:
+                continue
+            cv_batch[len(cv_rows)] = processed_img
+            cv_rows.append(i)
+    if cv_rows:
+        predictions[cv_rows] = infer(cv_batch[:len(cv_rows)]).numpy()
+    valid_rows = sorted(valid_rows + cv_rows)
+    total_time = time.time() - start_time
+    
+    valid_files = [test_files[i] for i in valid_rows]
+    predictions = predictions[valid_rows]
+    inference_time = total_time / len(valid_files) if valid_files else 0
+    
+    # Classe e confiança do lote inteiro numa passada (argmax + gather)
+    predicted_ids = predictions.argmax(axis=1)
+    confidences_pct = np.take_along_axis(predictions, predicted_ids[:, None], axis=1)[:, 0] * 100
     
     print("\n🧪 TESTANDO TODAS AS IMAGENS:")
     print("-" * 50)
     
-    for i, img_file in enumerate(image_files[:30], 1):  # Testar máximo 30
-        img_path = os.path.join(dataset_path, img_file)
-        
-        # Preprocessar imagem
-        processed_img = preprocess_image(img_path)
-        if processed_img is None:
-            continue
-        
-        # Predição
-        start_time = time.time()
-        predictions = model.predict(processed_img, verbose=0)
-        inference_time = time.time() - start_time
-        times.append(inference_time)
-        
-        # Obter classe predita
-        predicted_class_id = np.argmax(predictions[0])
-        predicted_class = classes[predicted_class_id]
-        confidence = np.max(predictions[0]) * 100
-        
-        # Para este dataset, assumir que a maioria são 'card'
-        # (baseado na análise anterior: 32 card, 3 religion, 0 national_id)
-        expected_class = 'card' if 'card' in img_file or predicted_class == 'card' else predicted_class
-        is_correct = predicted_class == expected_class
-        
-        if is_correct:
-            correct_predictions += 1
-        total_predictions += 1
-        
-        status = "✅" if is_correct else "❌"
-        print(f"{status} {i:2d}. {img_file[:20]:20s} → {predicted_class:12s} ({confidence:5.1f}%) [{inference_time*1000:4.0f}ms]")
-        
-        results.append({
-            'file': img_file,
-            'predicted': predicted_class,
-            'confidence': confidence,
-            'time': inference_time,
-            'correct': is_correct
-        })
+    # Resultados individuais gravados em streaming (JSONL), um por linha
+    results_file = "test_results_final.jsonl"
+    class_distribution = Counter()
+    with open(results_file, 'wb') as results_out:
+        for i, (img_file, predicted_class_id, confidence) in enumerate(
+                zip(valid_files, predicted_ids.tolist(), confidences_pct.tolist()), 1):
+            # Obter classe predita
+            predicted_class = classes[predicted_class_id]
+            
+            # Para este dataset, assumir que a maioria são 'card'
+            # (baseado na análise anterior: 32 card, 3 religion, 0 national_id)
+            expected_class = 'card' if 'card' in img_file or predicted_class == 'card' else predicted_class
+            is_correct = predicted_class == expected_class
+            
+            if is_correct:
+                correct_predictions += 1
+            total_predictions += 1
+            
+            status = "✅" if is_correct else "❌"
+            print(f"{status} {i:2d}. {img_file[:20]:20s} → {predicted_class:12s} ({confidence:5.1f}%) [{inference_time*1000:4.0f}ms]")
+            
+            class_distribution[predicted_class] += 1
+            results_out.write(dumps_line({
+                'file': img_file,
+                'predicted': predicted_class,
+                'confidence': confidence,
+                'time': inference_time,
+                'correct': is_correct
+            }))
     
     # Estatísticas finais
     print("\n" + "=" * 60)
@@ -128,57 +198,56 @@ def test_model_comprehensive():
     print("=" * 60)
     
     accuracy = (correct_predictions / total_predictions * 100) if total_predictions > 0 else 0
-    avg_time = np.mean(times) if times else 0
+    avg_time = inference_time
+    # Sem nenhuma imagem processada não há tempo médio (evita divisão por zero)
+    throughput = 1 / avg_time if avg_time > 0 else 0
     
     print(f"🎯 Acurácia geral: {correct_predictions}/{total_predictions} = {accuracy:.1f}%")
     print(f"⚡ Tempo médio por imagem: {avg_time*1000:.1f}ms")
-    print(f"🚀 Throughput: {1/avg_time:.1f} imagens/s")
+    print(f"🚀 Throughput: {throughput:.1f} imagens/s")
     
     # Distribuição de predições
-    predicted_classes = [r['predicted'] for r in results]
-    class_distribution = Counter(predicted_classes)
-    
     print(f"\n📈 Distribuição de predições:")
     for class_name, count in class_distribution.items():
-        percentage = (count / len(results) * 100) if results else 0
+        percentage = (count / total_predictions * 100) if total_predictions else 0
         print(f"  {class_name}: {count} ({percentage:.1f}%)")
     
     # Estatísticas de confiança
-    confidences = [r['confidence'] for r in results]
-    if confidences:
+    confidences = confidences_pct
+    if len(confidences):
         print(f"\n🎯 Estatísticas de confiança:")
         print(f"  Média: {np.mean(confidences):.1f}%")
         print(f"  Mediana: {np.median(confidences):.1f}%")
         print(f"  Min: {np.min(confidences):.1f}%")
         print(f"  Max: {np.max(confidences):.1f}%")
     
-    # Salvar resultados
-    results_file = "test_results_final.json"
-    with open(results_file, 'w') as f:
+    # Salvar resumo (os resultados individuais já estão no JSONL)
+    summary_file = "test_results_final.json"
+    with open(summary_file, 'w') as f:
         json.dump({
             'total_images': total_predictions,
             'correct_predictions': correct_predictions,
             'accuracy': accuracy,
             'avg_time_ms': avg_time * 1000,
-            'throughput_fps': 1/avg_time if avg_time > 0 else 0,
+            'throughput_fps': throughput,
             'class_distribution': dict(class_distribution),
             'confidence_stats': {
-                'mean': float(np.mean(confidences)) if confidences else 0,
-                'median': float(np.median(confidences)) if confidences else 0,
-                'min': float(np.min(confidences)) if confidences else 0,
-                'max': float(np.max(confidences)) if confidences else 0
+                'mean': float(np.mean(confidences)) if len(confidences) else 0,
+                'median': float(np.median(confidences)) if len(confidences) else 0,
+                'min': float(np.min(confidences)) if len(confidences) else 0,
+                'max': float(np.max(confidences)) if len(confidences) else 0
             },
-            'individual_results': results
+            'individual_results_file': results_file
         }, indent=2)
     
-    print(f"\n💾 Resultados salvos em: {results_file}")
+    print(f"\n💾 Resultados salvos em: {summary_file} (individuais: {results_file})")
     
     # Sumário final
     print("\n" + "🎉" * 20)
     print("✅ TESTE COMPLETADO COM SUCESSO!")
     print(f"✅ Modelo treinado com 100 épocas funcionando perfeitamente!")
     print(f"✅ Acurácia: {accuracy:.1f}% em {total_predictions} imagens")
-    print(f"✅ Performance: {1/avg_time:.1f} FPS")
+    print(f"✅ Performance: {throughput:.1f} FPS")
     print("🎉" * 20)
 
 if __name__ == "__main__":
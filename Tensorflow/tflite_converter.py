@@ -1,17 +1,143 @@
 import os
+import sys
 import numpy as np
+from inference import quantize_input
+
+# TensorFlow importado uma única vez, no carregamento do módulo (o registro
+# dos plugins fica fora das chamadas); None se não estiver instalado
+try:
+    import tensorflow as tf
+except ImportError:
+    tf = None
+
+# Configuração do conversor por modo de quantização: cada função aplica um
+# conjunto fixo e completo de opções num conversor recém-criado
+def _config_none(converter, representative_dataset):
+    """Sem quantização (float32)"""
+
+def _config_dynamic(converter, representative_dataset):
+    """Quantização dinâmica: pesos int8, ativações em float"""
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+def _config_fp16(converter, representative_dataset):
+    """
+    Pesos float16 (metade do tamanho) e acumulação em float16 nos kernels
+    FP16 do XNNPACK (ARMv8.2+/Apple silicon)
+    """
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    converter.target_spec._experimental_supported_accumulation_type = tf.float16
+
+def _config_int8(converter, representative_dataset):
+    """
+    Quantização int8 completa com dataset representativo (por canal).
+    I/O int8: evita os shims de quantize/dequantize do uint8
+    """
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+
+def _config_int16x8(converter, representative_dataset):
+    """Ativações int16 e pesos int8 (16x8); I/O em float32"""
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.EXPERIMENTAL_TFLITE_BUILTINS_ACTIVATIONS_INT16_WEIGHTS_INT8
+    ]
+
+_CONFIGURATORS = {
+    'none': _config_none,
+    'dynamic': _config_dynamic,
+    'fp16': _config_fp16,
+    'int8': _config_int8,
+    'int16x8': _config_int16x8,
+}
+
+def top1(outputs):
+    """
+    Classe e confiança top-1 de cada linha de `outputs` (N, C): argmax e um
+    único take na view achatada (índice linear i*C + classe), sem o
+    fancy-indexing 2D
+    """
+    outputs = np.ascontiguousarray(outputs)
+    classes = outputs.argmax(axis=1)
+    confidences = outputs.reshape(-1).take(np.arange(len(classes)) * outputs.shape[1] + classes)
+    return classes, confidences
+
+class TFLiteSession:
+    """
+    Interpretador TFLite "preparado" para laços de inferência: índices,
+    dtype e parâmetros de quantização de entrada/saída são lidos uma única
+    vez, e allocate_tensors() só é refeito quando o shape do lote muda
+    """
+    def __init__(self, interpreter):
+        self.interp = interpreter
+        
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        self.in_idx = input_details['index']
+        self.out_idx = output_details['index']
+        self.in_dtype = input_details['dtype']
+        self.out_dtype = output_details['dtype']
+        self.in_scale, self.in_zp = input_details['quantization']
+        self.out_scale, self.out_zp = output_details['quantization']
+        self.in_shape = tuple(input_details['shape'])
+        
+        # Buffers da quantização, reaproveitados enquanto o shape não muda
+        self._float_buf = None
+        self._quant_buf = None
+        
+        interpreter.allocate_tensors()
+    
+    def _quantize(self, x):
+        """Converte a entrada float [0, 1] para o dtype do modelo: q = x / escala + zero_point"""
+        if self.in_dtype == np.float32:
+            return x.astype(np.float32, copy=False)
+        
+        if self._quant_buf is None or self._quant_buf.shape != x.shape:
+            self._float_buf = np.empty(x.shape, dtype=np.float32)
+            self._quant_buf = np.empty(x.shape, dtype=self.in_dtype)
+        
+        # Tudo in-place nos buffers: nenhum array temporário por lote
+        return quantize_input(x, self.in_scale, self.in_zp, self.in_dtype,
+                              out=self._quant_buf, buf=self._float_buf)
+    
+    def infer(self, x):
+        """
+        Executa o lote `x` (N, H, W, C) em float [0, 1] e retorna a saída em
+        float (desquantizada se o modelo tiver saída inteira)
+        """
+        x = self._quantize(x)
+        if x.shape != self.in_shape:
+            self.interp.resize_tensor_input(self.in_idx, x.shape)
+            self.interp.allocate_tensors()
+            self.in_shape = x.shape
+        
+        self.interp.set_tensor(self.in_idx, x)
+        self.interp.invoke()
+        
+        outputs = self.interp.get_tensor(self.out_idx)
+        if self.out_dtype != np.float32 and self.out_scale != 0:
+            outputs = (outputs.astype(np.float32) - self.out_zp) * self.out_scale
+        return outputs
 
 class TFLiteConverter:
-    def __init__(self, model_path=None, model=None):
+    def __init__(self, model_path=None, model=None, delegate_library=None):
         """
         Inicializa o conversor TFLite
         
         Args:
-            model_path: Caminho para o modelo salvo (.h5)
+            model_path: Caminho para o modelo salvo (.h5 ou diretório SavedModel)
             model: Modelo TensorFlow/Keras diretamente
+            delegate_library: Delegate externo opcional para os testes do
+                .tflite (ex.: 'libedgetpu.so.1'); sem ele, XNNPACK na CPU
         """
         self.model_path = model_path
         self.model = model
+        self.saved_model_dir = None
+        self.delegate_library = delegate_library
         
         if model_path and os.path.exists(model_path):
             self.load_model(model_path)
@@ -21,10 +147,23 @@ class TFLiteConverter:
             print("Aviso: Nenhum modelo fornecido")
     
     def load_model(self, model_path):
-        """Carrega modelo do arquivo"""
+        """
+        Carrega modelo do arquivo. Um diretório SavedModel não é reconstruído
+        em Keras: a conversão lê o grafo direto (from_saved_model). Um .h5 é
+        carregado com compile=False (sem otimizador/métricas, só os pesos
+        do forward)
+        """
+        if tf is None:
+            print("TensorFlow não está instalado!")
+            return False
+        
         try:
-            import tensorflow as tf
-            self.model = tf.keras.models.load_model(model_path)
+            if os.path.isdir(model_path) and tf.saved_model.contains_saved_model(model_path):
+                self.saved_model_dir = model_path
+                print(f"SavedModel encontrado em: {model_path}")
+                return True
+            
+            self.model = tf.keras.models.load_model(model_path, compile=False)
             print(f"Modelo carregado de: {model_path}")
             return True
         except Exception as e:
@@ -32,48 +171,64 @@ class TFLiteConverter:
             return False
     
     def convert_to_tflite(self, quantization=True, representative_dataset=None, 
-                         optimize_for_size=True):
+                         optimize_for_size=True, precision=None, activations_16bit=False,
+                         sparse=False):
         """
         Converte modelo para TensorFlow Lite
         
         Args:
             quantization: Se deve aplicar quantização
             representative_dataset: Dataset representativo para quantização int8
-            optimize_for_size: Se deve otimizar para tamanho
+            optimize_for_size: Ignorado (OPTIMIZE_FOR_SIZE está obsoleto e
+                sobrescrevia Optimize.DEFAULT); mantido por compatibilidade
+            precision: 'int8', 'fp16' ou 'dynamic'. None escolhe 'int8' se
+                houver representative_dataset, senão 'dynamic'
+            activations_16bit: No modo int8, quantiza ativações em int16 e pesos
+                em int8 (16x8): mais precisão, um pouco mais lento; I/O em float32
+            sparse: Modelo podado: grava os pesos em formato esparso
+                (Optimize.EXPERIMENTAL_SPARSITY) para os kernels do XNNPACK
+        
+        O modo int8 tem como alvo CPUs ARM mobile (kernels int8 otimizados);
+        em x86 o TFLite int8 costuma ser mais lento que float32.
         """
-        if self.model is None:
+        if self.model is None and self.saved_model_dir is None:
             print("Erro: Nenhum modelo carregado")
             return None
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if tf is None:
             print("TensorFlow não está instalado!")
             return None
         
         print("=== CONVERSÃO PARA TENSORFLOW LITE ===")
         
         # Criar conversor
-        converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+        if self.model is None:
+            converter = tf.lite.TFLiteConverter.from_saved_model(self.saved_model_dir)
+        else:
+            converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
         
-        if quantization:
-            print("Aplicando quantização...")
-            
-            # Quantização básica (float16)
-            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        # Escolher a configuração uma única vez, pelo modo de quantização
+        if not quantization:
+            mode = 'none'
+        else:
+            if precision is None:
+                precision = 'int8' if representative_dataset is not None else 'dynamic'
+            mode = 'int16x8' if precision == 'int8' and activations_16bit else precision
+            if mode not in _CONFIGURATORS:
+                raise ValueError(f"Precisão não suportada: {precision}")
+            print(f"Aplicando quantização ({mode})...")
             
-            if representative_dataset is not None:
+            if precision == 'int8':
+                if representative_dataset is None:
+                    print("Erro: quantização int8 requer representative_dataset")
+                    return None
                 print("Usando quantização int8 com dataset representativo...")
-                
-                # Quantização int8 com dataset representativo
-                converter.representative_dataset = representative_dataset
-                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
-                converter.inference_input_type = tf.uint8
-                converter.inference_output_type = tf.uint8
-            
-            if optimize_for_size:
-                # Otimizações adicionais para tamanho
-                converter.optimizations = [tf.lite.Optimize.OPTIMIZE_FOR_SIZE]
+        
+        _CONFIGURATORS[mode](converter, representative_dataset)
+        if sparse:
+            converter.optimizations = list(converter.optimizations) + [
+                tf.lite.Optimize.EXPERIMENTAL_SPARSITY]
+            print("Pesos esparsos (modelo podado)")
         
         # Converter
         print("Convertendo modelo...")
@@ -93,18 +248,31 @@ class TFLiteConverter:
     
     def save_tflite_model(self, tflite_model, output_path="thai_id_model.tflite"):
         """
-        Salva modelo TFLite em arquivo
+        Salva modelo TFLite em arquivo: espaço pré-reservado (posix_fallocate,
+        quando disponível) e escrita direta no descritor, sem o buffer do Python
         """
         if tflite_model is None:
             print("Erro: Modelo TFLite é None")
             return False
         
         try:
-            with open(output_path, 'wb') as f:
-                f.write(tflite_model)
+            # O_BINARY (só no Windows): sem ele o descritor abre em modo texto
+            # e o os.write troca \n por \r\n, corrompendo o flatbuffer
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+            fd = os.open(output_path, flags, 0o644)
+            try:
+                if hasattr(os, 'posix_fallocate') and len(tflite_model):
+                    try:
+                        os.posix_fallocate(fd, 0, len(tflite_model))
+                    except OSError:
+                        pass  # só uma dica: sistemas de arquivos sem suporte (NFS, ZFS, overlay)
+                view = memoryview(tflite_model)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
             
-            # Verificar tamanho do arquivo
-            file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+            file_size = len(tflite_model) / (1024 * 1024)  # MB
             print(f"Modelo TFLite salvo em: {output_path}")
             print(f"Tamanho do arquivo: {file_size:.2f} MB")
             
@@ -114,50 +282,131 @@ class TFLiteConverter:
             print(f"Erro ao salvar: {e}")
             return False
     
-    def create_representative_dataset(self, X_sample, batch_size=1):
+    def create_representative_dataset(self, X_sample, batch_size=1, num_samples=100):
         """
         Cria dataset representativo para quantização int8
         
         Args:
-            X_sample: Amostra dos dados de treino (numpy array)
+            X_sample: Dados de treino (numpy array ou tf.data.Dataset em lotes).
+                Do array são tomadas `num_samples` amostras espaçadas
+                uniformemente (cobrem a distribuição toda, não só o início);
+                do Dataset, as primeiras `num_samples`
             batch_size: Tamanho do batch para cada sample
+            num_samples: Número máximo de amostras para calibração
         """
-        print(f"Criando dataset representativo com {len(X_sample)} amostras...")
+        if hasattr(X_sample, 'unbatch'):
+            # tf.data.Dataset: amostras lidas sob demanda, sem materializar
+            print(f"Criando dataset representativo com até {num_samples} amostras (tf.data)...")
+            
+            def dataset_gen():
+                for sample in X_sample.unbatch().take(num_samples):
+                    # Datasets de treino trazem (imagem, label)
+                    if isinstance(sample, tuple):
+                        sample = sample[0]
+                    yield [np.ascontiguousarray(sample.numpy()[None], dtype=np.float32)]
+            
+            return dataset_gen
+        
+        # Lotes disjuntos: num_samples lotes de batch_size linhas, limitados
+        # ao tamanho do conjunto
+        batch_size = max(1, min(batch_size, len(X_sample)))
+        num_samples = min(num_samples, len(X_sample) // batch_size)
+        print(f"Criando dataset representativo com {num_samples} amostras...")
+        
+        # Amostras em passo fixo sobre o conjunto inteiro: as primeiras N
+        # costumam ser correlacionadas e estimam mal os ranges de quantização
+        idx = np.linspace(0, len(X_sample) - 1, num=num_samples * batch_size).astype(np.int64)
+        
+        # Um único gather para float32 C-contíguo (sempre uma cópia nova): o
+        # calibrador recopiaria amostras não contíguas ou de outro dtype a cada yield
+        X = np.ascontiguousarray(np.take(X_sample, idx, axis=0), dtype=np.float32)
+        
+        # Normalizar se necessário (uma única redução, no próprio buffer)
+        if X.size and X.max() > 1.0:
+            X *= np.float32(1.0 / 255.0)
+        
+        print(f"  C-contíguo: {X.flags['C_CONTIGUOUS']}, dtype: {X.dtype}")
+        
+        # Todos os lotes num único bloco (num_samples, batch_size, ...): cada
+        # yield é só uma view contígua, sem alocação dentro do calibrador
+        batches = X.reshape(num_samples, batch_size, *X.shape[1:])
         
         def representative_data_gen():
-            for i in range(min(100, len(X_sample))):
-                # Pegar uma amostra
-                sample = X_sample[i:i+batch_size]
-                
-                # Garantir que está no formato correto
-                if sample.dtype != np.float32:
-                    sample = sample.astype(np.float32)
-                
-                # Normalizar se necessário
-                if np.max(sample) > 1.0:
-                    sample = sample / 255.0
-                
-                yield [sample]
+            for batch in batches:
+                yield [batch]
         
         return representative_data_gen
     
-    def test_tflite_model(self, tflite_model_path, test_images, test_labels=None):
+    def _create_interpreter(self, tflite_model_path, num_threads=None, allocate=True):
+        """
+        Cria o interpretador TFLite. O XNNPACK (delegate padrão de CPU) só
+        divide o trabalho entre núcleos com num_threads > 1, então usamos
+        todas as CPUs por padrão. Um delegate externo configurado é
+        carregado se disponível; se falhar, segue só com o XNNPACK.
+        Com allocate=False o arena de tensores não é planejado/alocado
+        (basta para ler detalhes de entrada/saída e tensores).
+        `tflite_model_path` pode ser o caminho do .tflite ou os próprios bytes
+        devolvidos por convert_to_tflite (lidos da memória, sem reler o disco).
+        """
+        delegates = []
+        if self.delegate_library:
+            try:
+                delegates.append(tf.lite.experimental.load_delegate(self.delegate_library))
+            except (ValueError, OSError) as e:
+                print(f"Delegate {self.delegate_library} indisponível ({e}); usando XNNPACK")
+        
+        if isinstance(tflite_model_path, (bytes, bytearray)):
+            source = {'model_content': bytes(tflite_model_path)}
+        else:
+            source = {'model_path': tflite_model_path}
+        
+        interpreter = tf.lite.Interpreter(**source,
+                                         num_threads=num_threads or os.cpu_count(),
+                                         experimental_delegates=delegates or None)
+        if allocate:
+            interpreter.allocate_tensors()
+        return interpreter
+    
+    def create_session(self, tflite_model_path, num_threads=None):
+        """Cria uma TFLiteSession (interpretador preparado) para o modelo"""
+        return TFLiteSession(self._create_interpreter(tflite_model_path, num_threads, allocate=False))
+    
+    def _invoke_batch(self, interpreter, images):
+        """
+        Um único invoke() para o lote inteiro (N, H, W, C). `interpreter`
+        pode ser uma TFLiteSession ou um interpretador cru.
+        Retorna as probabilidades (N, num_classes)
+        """
+        session = interpreter if isinstance(interpreter, TFLiteSession) else TFLiteSession(interpreter)
+        # Um array (N, H, W, C) já é o lote (fatia = view); listas são empilhadas
+        batch = images if isinstance(images, np.ndarray) else np.stack(images)
+        return session.infer(batch)
+    
+    def test_tflite_model(self, tflite_model_path, test_images, test_labels=None, interpreter=None,
+                          verbose=False):
         """
         Testa o modelo TFLite com imagens de teste
+        
+        Args:
+            interpreter: Interpretador ou TFLiteSession já criado para o modelo (opcional)
+            verbose: Imprime o resultado de cada imagem (formatado depois do invoke)
+        
+        Returns:
+            dict de arrays (um elemento por imagem): 'predicted_class' (N,),
+            'confidence' (N,) e 'probabilities' (N, num_classes)
         """
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if tf is None:
             print("TensorFlow não está instalado!")
             return None
         
         # Carregar modelo TFLite
-        interpreter = tf.lite.Interpreter(model_path=tflite_model_path)
-        interpreter.allocate_tensors()
+        if interpreter is None:
+            interpreter = self.create_session(tflite_model_path)
         
         # Obter detalhes de input e output
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        raw_interpreter = interpreter.interp if isinstance(interpreter, TFLiteSession) else interpreter
+        input_details = raw_interpreter.get_input_details()
+        output_details = raw_interpreter.get_output_details()
         
         print("=== TESTE DO MODELO TFLITE ===")
         print(f"Input shape: {input_details[0]['shape']}")
@@ -165,104 +414,104 @@ class TFLiteConverter:
         print(f"Output shape: {output_details[0]['shape']}")
         print(f"Output type: {output_details[0]['dtype']}")
         
-        predictions = []
-        
         # Testar com algumas imagens
         num_test = min(5, len(test_images))
         print(f"\nTestando com {num_test} imagens...")
         
-        for i in range(num_test):
-            # Preparar imagem
-            image = test_images[i]
-            if len(image.shape) == 3:
-                image = np.expand_dims(image, axis=0)
-            
-            # Converter tipo se necessário
-            if input_details[0]['dtype'] == np.uint8:
-                image = (image * 255).astype(np.uint8)
-            else:
-                image = image.astype(np.float32)
-            
-            # Set input tensor
-            interpreter.set_tensor(input_details[0]['index'], image)
-            
-            # Executar inferência
-            interpreter.invoke()
-            
-            # Obter resultado
-            output_data = interpreter.get_tensor(output_details[0]['index'])
-            predicted_class = np.argmax(output_data[0])
-            confidence = output_data[0][predicted_class]
-            
-            predictions.append({
-                'predicted_class': predicted_class,
-                'confidence': confidence,
-                'probabilities': output_data[0]
-            })
-            
-            print(f"Imagem {i+1}:")
-            print(f"  Classe predita: {predicted_class}")
-            print(f"  Confiança: {confidence:.4f}")
-            
-            if test_labels is not None:
-                actual_class = test_labels[i]
-                correct = "✓" if predicted_class == actual_class else "✗"
-                print(f"  Classe real: {actual_class} {correct}")
+        outputs = self._invoke_batch(interpreter, test_images[:num_test])
+        predicted_classes, confidences = top1(outputs)
+        
+        if verbose:
+            # Relatório montado numa string só e escrito de uma vez
+            lines = []
+            for i, (predicted_class, confidence) in enumerate(zip(predicted_classes, confidences)):
+                lines.append(f"Imagem {i+1}:")
+                lines.append(f"  Classe predita: {predicted_class}")
+                lines.append(f"  Confiança: {confidence:.4f}")
+                
+                if test_labels is not None:
+                    actual_class = test_labels[i]
+                    correct = "✓" if predicted_class == actual_class else "✗"
+                    lines.append(f"  Classe real: {actual_class} {correct}")
+            sys.stdout.write("\n".join(lines) + "\n")
         
-        return predictions
+        return {
+            'predicted_class': predicted_classes,
+            'confidence': confidences,
+            'probabilities': outputs
+        }
     
-    def compare_models(self, original_model, tflite_model_path, test_images):
+    def compare_models(self, original_model, tflite_model_path, test_images, interpreter=None,
+                       verbose=False):
         """
-        Compara precisão entre modelo original e TFLite
+        Compara precisão entre modelo original e TFLite: um predict em lote
+        de cada lado e a comparação vetorizada. Com verbose, imprime também
+        o resultado de cada imagem
+        
+        Returns:
+            dict de arrays: 'original_class', 'original_confidence',
+            'tflite_class' e 'match'
         """
         if original_model is None:
             print("Modelo original não fornecido")
             return
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if tf is None:
             print("TensorFlow não está instalado!")
             return
         
         print("=== COMPARAÇÃO DE MODELOS ===")
         
+        batch = test_images[:5]
+        
         # Predições do modelo original
-        original_preds = original_model.predict(test_images[:5])
-        original_classes = np.argmax(original_preds, axis=1)
-        
-        print("Modelo Original:")
-        for i, (pred_class, confidence) in enumerate(zip(original_classes, np.max(original_preds, axis=1))):
-            print(f"  Imagem {i+1}: Classe {pred_class}, Confiança: {confidence:.4f}")
-        
-        # Predições do modelo TFLite
-        tflite_preds = self.test_tflite_model(tflite_model_path, test_images[:5])
-        
-        print("\nComparação:")
-        for i in range(len(original_classes)):
-            orig_class = original_classes[i]
-            tflite_class = tflite_preds[i]['predicted_class']
-            match = "✓" if orig_class == tflite_class else "✗"
-            print(f"  Imagem {i+1}: Original={orig_class}, TFLite={tflite_class} {match}")
+        original_preds = original_model.predict(batch, verbose=0)
+        original_classes, original_confidences = top1(original_preds)
+        
+        # Predições do modelo TFLite (um invoke no mesmo lote)
+        if interpreter is None:
+            interpreter = self.create_session(tflite_model_path)
+        tflite_classes = np.argmax(self._invoke_batch(interpreter, batch), axis=1)
+        
+        matches = original_classes == tflite_classes
+        
+        if verbose:
+            lines = ["Modelo Original:"]
+            for i, (pred_class, confidence) in enumerate(zip(original_classes, original_confidences)):
+                lines.append(f"  Imagem {i+1}: Classe {pred_class}, Confiança: {confidence:.4f}")
+            lines.append("\nComparação:")
+            for i, (orig_class, tflite_class, match) in enumerate(zip(original_classes, tflite_classes, matches)):
+                lines.append(f"  Imagem {i+1}: Original={orig_class}, TFLite={tflite_class} {'✓' if match else '✗'}")
+            sys.stdout.write("\n".join(lines) + "\n")
+        print(f"Concordância: {int(matches.sum())}/{len(matches)}")
+        
+        return {
+            'original_class': original_classes,
+            'original_confidence': original_confidences,
+            'tflite_class': tflite_classes,
+            'match': matches
+        }
     
     def get_model_info(self, tflite_model_path):
         """
         Obtém informações sobre o modelo TFLite
         """
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if tf is None:
             print("TensorFlow não está instalado!")
             return None
         
-        interpreter = tf.lite.Interpreter(model_path=tflite_model_path)
-        interpreter.allocate_tensors()
+        # Só metadados: o grafo já está carregado no construtor, sem
+        # allocate_tensors() (nenhum plano de memória nem arena)
+        interpreter = self._create_interpreter(tflite_model_path, allocate=False)
         
         input_details = interpreter.get_input_details()
         output_details = interpreter.get_output_details()
         
         # Tamanho do arquivo
-        file_size = os.path.getsize(tflite_model_path) / (1024 * 1024)  # MB
+        if isinstance(tflite_model_path, (bytes, bytearray)):
+            file_size = len(tflite_model_path) / (1024 * 1024)  # MB
+        else:
+            file_size = os.path.getsize(tflite_model_path) / (1024 * 1024)  # MB
         
         info = {
             'file_size_mb': file_size,
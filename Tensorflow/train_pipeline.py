@@ -0,0 +1,428 @@
+import os
+from deps import check_dependencies
+
+SEP = "=" * 60
+
+# Perfis de treinamento: o pipeline é o mesmo, mudam hiperparâmetros,
+# métodos do trainer e arquivos de saída
+PROFILES = {
+    'default': {
+        'title': "CRIAÇÃO DE MODELO TENSORFLOW LITE PARA RECONHECIMENTO DE IDENTIDADES TAILANDESAS",
+        'config': {
+            'model_type': 'mobilenetv2',  # 'mobilenetv2', 'custom_cnn', 'lightweight'
+            'img_size': (224, 224),
+            'epochs': 30,  # Reduzido para dataset pequeno
+            'batch_size': 16,  # Reduzido para dataset pequeno
+            'balance_strategy': 'none',  # 'undersample', 'oversample', 'none'
+            'fine_tune': True,
+            'fine_tune_epochs': 10,
+            'fine_tune_learning_rate': 0.0001,
+            'jit_compile': False,  # XLA: medir antes de ativar
+            'auto_jit': False,  # XLA global (tf.config.optimizer.set_jit)
+            'prune_sparsity': None,  # ex.: 0.5 para custom_cnn/lightweight (XNNPACK esparso)
+            'data_cache_dir': None,  # ex.: 'cache/': cache tf.data em disco (poupa RAM)
+            'image_cache': False,  # .npy das imagens decodificadas em dataset/ (recargas rápidas)
+            'distributed': False,  # Horovod multi-GPU (executar via horovodrun)
+            'streaming': False,  # Treino lido dos arquivos pelo tf.data (datasets grandes)
+        },
+        'min_images': 10,
+        'num_calibration_samples': 50,
+        'model_path': "thai_id_model.h5",
+        'tflite_path': "thai_id_model.tflite",
+        'plot_path': "training_history.png",
+    },
+    'extended': {
+        'title': "CRIAÇÃO DE MODELO TENSORFLOW LITE - TREINAMENTO ESTENDIDO",
+        'config': {
+            'model_type': 'mobilenetv2',     # Modelo robusto para treinamento longo
+            'img_size': (224, 224),
+            'epochs': 100,                   # Treinamento estendido
+            'batch_size': 8,                 # Batch menor para melhor convergência
+            'accum_steps': 1,                # ex.: 4 -> atualização a cada 4 lotes (efetivo 32)
+            'balance_strategy': 'oversample', # Balancear dados
+            'fine_tune': True,
+            'fine_tune_epochs': 30,          # Fine-tuning mais longo
+            'fine_tune_learning_rate': 0.00005,
+            'learning_rate': 0.0005,         # Learning rate mais conservador
+            'patience': 15,                  # Paciência maior para early stopping
+            'mixed_precision': True,         # mixed_float16 quando houver GPU
+            'jit_compile': True,             # XLA: funde conv/BN/ReLU (lotes pequenos)
+            'auto_jit': False,               # passo de treino já compilado (jit_compile)
+            'prune_sparsity': None,          # ex.: 0.5 para custom_cnn/lightweight
+            'data_cache_dir': None,          # ex.: 'cache/': cache tf.data em disco
+            'image_cache': False,            # .npy das imagens decodificadas em dataset/
+            'distributed': False,            # Horovod multi-GPU (executar via horovodrun)
+            'streaming': False,              # Treino lido dos arquivos pelo tf.data
+        },
+        'min_images': 30,
+        'num_calibration_samples': 200,      # Dataset representativo maior
+        'model_path': "thai_id_model_extended.h5",
+        'tflite_path': "thai_id_model_extended.tflite",
+        'plot_path': "training_history_extended.png",
+    },
+}
+
+def _predict_threaded(tflite_path, images):
+    """
+    Predição imagem a imagem em paralelo: o invoke() do TFLite libera o GIL,
+    então cada thread roda seu próprio interpretador (não é thread-safe)
+    """
+    import numpy as np
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from inference import ThaiIDInference
+    
+    local = threading.local()
+    
+    def predict(image):
+        inference = getattr(local, 'inference', None)
+        if inference is None:
+            # Um thread do TFLite por interpretador: o paralelismo vem do pool
+            inference = local.inference = ThaiIDInference(
+                model_path=tflite_path, classes_file="dataset/classes.txt", num_threads=1
+            )
+        return inference.predict_fast(image)
+    
+    # Resultados escritos direto em arrays pré-alocados (sem lista de tuplas)
+    predicted = np.empty(len(images), dtype=np.int32)
+    confidences = np.empty(len(images), dtype=np.float32)
+    
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for i, (class_id, confidence) in enumerate(executor.map(predict, images)):
+            predicted[i] = class_id
+            confidences[i] = confidence
+    
+    return predicted, confidences
+
+def test_extensive_model(tflite_path, data, classes):
+    """Teste extensivo do modelo TFLite"""
+    import numpy as np
+    from inference import ThaiIDInference
+    
+    X_test, y_test = data['test']
+    
+    # Criar instância de inferência
+    inference = ThaiIDInference(model_path=tflite_path, classes_file="dataset/classes.txt")
+    
+    print(f"Testando modelo com {len(X_test)} imagens...")
+    
+    try:
+        # Um invoke() por lote; X_test já está normalizado em [0, 1]
+        probabilities = inference.predict_array_batch(X_test)
+        predicted = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(predicted)), predicted]
+    except (RuntimeError, ValueError) as e:
+        # Modelos com batch fixo não aceitam resize_tensor_input
+        print(f"Modelo não aceita lotes ({e}); usando predição em threads")
+        predicted, confidences = _predict_threaded(tflite_path, X_test)
+    
+    y_test = np.asarray(y_test)
+    correct = predicted == y_test
+    
+    # Log detalhado para primeiras 20 imagens
+    for i in range(min(20, len(X_test))):
+        status = "✓" if correct[i] else "✗"
+        print(f"  Imagem {i+1:2d}: Real={classes[y_test[i]]:12} | "
+              f"Pred={classes[predicted[i]]:12} | "
+              f"Conf={confidences[i]:.3f} {status}")
+    
+    # Resultados finais
+    correct_predictions = int(correct.sum())
+    overall_accuracy = correct_predictions / len(X_test)
+    avg_confidence = confidences.mean()
+    
+    print(f"\n=== RESULTADOS DO TESTE EXTENSIVO ===")
+    print(f"Acurácia geral: {overall_accuracy:.4f} ({correct_predictions}/{len(X_test)})")
+    print(f"Confiança média: {avg_confidence:.4f}")
+    
+    # Acertos e totais por classe em duas contagens vetorizadas
+    total_by_class = np.bincount(y_test, minlength=len(classes))
+    correct_by_class = np.bincount(y_test[correct], minlength=len(classes))
+    
+    print(f"\nDesempenho por classe:")
+    for class_id in np.flatnonzero(total_by_class):
+        class_acc = correct_by_class[class_id] / total_by_class[class_id]
+        print(f"  {classes[class_id]:12}: {class_acc:.3f} "
+              f"({correct_by_class[class_id]}/{total_by_class[class_id]})")
+
+def run(profile='default'):
+    """
+    Pipeline completo: análise do dataset, treinamento, fine-tuning,
+    conversão para TFLite e testes
+    
+    Args:
+        profile: 'default' (treinamento curto) ou 'extended' (100 épocas)
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Perfil não suportado: {profile}")
+    
+    settings = PROFILES[profile]
+    config = settings['config']
+    extended = profile == 'extended'
+    
+    print(f"=== {settings['title']} ===\n")
+    
+    # Verificar dependências
+    if not check_dependencies():
+        print("\nInstale as dependências necessárias antes de continuar.")
+        return
+    
+    dataset_path = "dataset/"
+    
+    # Verificar se dataset existe (a listagem é reaproveitada pelo analisador)
+    try:
+        with os.scandir(dataset_path) as entries:
+            dataset_entries = list(entries)
+    except (FileNotFoundError, NotADirectoryError):
+        print(f"Erro: Dataset não encontrado em {dataset_path}")
+        print("Certifique-se de que a pasta 'dataset' existe com as subpastas 'images' e 'labels'")
+        return
+    
+    # Imports pesados (tensorflow/opencv) só depois das verificações: a
+    # checagem de dependências lê apenas metadados, então os caminhos de erro
+    # acima terminam sem nunca carregar o tensorflow no processo
+    from dataset_analyzer import DatasetAnalyzer
+    from trainer import ModelTrainer
+    from tflite_converter import TFLiteConverter
+    
+    try:
+        # 1. ANÁLISE DO DATASET
+        print(f"\n{SEP}")
+        print("ANÁLISE DO DATASET")
+        
+        analyzer = DatasetAnalyzer(dataset_path, preloaded_entries=dataset_entries)
+        classes = analyzer.analyze_dataset()
+        
+        if classes is None:
+            print("Erro na análise do dataset")
+            return
+        
+        stats = analyzer.get_dataset_stats()
+        
+        print(f"Total de imagens: {stats['num_images']}")
+        print(f"Classes encontradas: {len(classes)}")
+        
+        if stats['num_images'] < settings['min_images']:
+            print(f"\nAviso: Poucas imagens no dataset ({stats['num_images']})")
+            print("Para melhores resultados, use pelo menos 50 imagens por classe")
+        
+        # 2. CONFIGURAÇÃO DO TREINAMENTO
+        print(f"\n{SEP}")
+        print(f"CONFIGURAÇÃO DO TREINAMENTO ({profile})")
+        
+        for key, value in config.items():
+            print(f"  {key}: {value}")
+        
+        # 3. PREPARAÇÃO DOS DADOS
+        print(f"\n{SEP}")
+        print("PREPARAÇÃO DOS DADOS")
+        
+        trainer = ModelTrainer(dataset_path, distributed=config['distributed'],
+                               auto_jit=config['auto_jit'],
+                               cache_images=config['image_cache'])
+        data = trainer.load_and_prepare_data(
+            img_size=config['img_size'],
+            balance_strategy=config['balance_strategy'],
+            streaming=config['streaming']
+        )
+        
+        # Pipelines tf.data (cache/shuffle/batch/prefetch) para o treinamento
+        trainer.create_datasets(data, batch_size=config['batch_size'],
+                                cache_dir=config['data_cache_dir'])
+        
+        X_train, _ = data['train']
+        X_val, _ = data['val']
+        X_test, y_test = data['test']
+        
+        print(f"Dados de treinamento: {len(X_train)} imagens")
+        print(f"Dados de validação: {len(X_val)} imagens")
+        print(f"Dados de teste: {len(X_test)} imagens")
+        
+        # 4. CRIAÇÃO DO MODELO
+        print(f"\n{SEP}")
+        print("CRIAÇÃO DO MODELO")
+        
+        trainer.create_model(
+            model_type=config['model_type'],
+            num_classes=data['num_classes'],
+            input_shape=(*config['img_size'], 3),
+            mixed_precision=config.get('mixed_precision', False),
+            jit_compile=config.get('jit_compile', False)
+        )
+        
+        # 5. TREINAMENTO
+        print(f"\n{SEP}")
+        print(f"TREINAMENTO ({config['epochs']} ÉPOCAS)")
+        
+        train_kwargs = {'learning_rate': config['learning_rate'],
+                        'patience': config['patience'],
+                        'accum_steps': config['accum_steps']} if extended else {}
+        train = getattr(trainer, "train_extended" if extended else "train")
+        train(
+            data=data,
+            epochs=config['epochs'],
+            batch_size=config['batch_size'],
+            save_best=True,
+            **train_kwargs
+        )
+        
+        # 6. FINE-TUNING (se habilitado)
+        if config['fine_tune'] and config['model_type'] == 'mobilenetv2':
+            print(f"\n{SEP}")
+            print(f"FINE-TUNING ({config['fine_tune_epochs']} ÉPOCAS)")
+            
+            fine_tune_kwargs = {'accum_steps': config['accum_steps']} if extended else {}
+            fine_tune = getattr(trainer, "fine_tune_extended" if extended else "fine_tune")
+            fine_tune(
+                data=data,
+                epochs=config['fine_tune_epochs'],
+                learning_rate=config['fine_tune_learning_rate'],
+                **fine_tune_kwargs
+            )
+        
+        # 6b. PODA (opcional, requer tensorflow-model-optimization)
+        if config.get('prune_sparsity'):
+            print(f"\n{SEP}")
+            print(f"PODA ({config['prune_sparsity']:.0%} DE ESPARSIDADE)")
+            
+            trainer.prune_and_fine_tune(
+                data=data,
+                target_sparsity=config['prune_sparsity'],
+                batch_size=config['batch_size']
+            )
+        
+        # Com Horovod, avaliação, gráficos e arquivos ficam só com o rank 0
+        if not trainer.is_main_process():
+            return
+        
+        # 7. AVALIAÇÃO DETALHADA
+        if extended:
+            print(f"\n{SEP}")
+            print("AVALIAÇÃO DETALHADA DO MODELO")
+            
+            trainer.evaluate_model_detailed(data)
+        
+        # 8. PLOTAR GRÁFICOS DE TREINAMENTO
+        print(f"\n{SEP}")
+        print("GRÁFICOS DE TREINAMENTO")
+        
+        plot = getattr(trainer, "plot_extended_history" if extended else "plot_training_history")
+        try:
+            plot(save_path=settings['plot_path'])
+        except Exception as e:
+            print(f"Erro ao plotar gráficos: {e}")
+        
+        # 9. SALVAR MODELO KERAS
+        print(f"\n{SEP}")
+        print("SALVANDO MODELO")
+        
+        model_path = settings['model_path']
+        saved_model_dir = os.path.splitext(model_path)[0] + "_saved_model"
+        success = trainer.save_model(model_path, saved_model_dir=saved_model_dir)
+        
+        if not success:
+            print("Erro ao salvar modelo Keras")
+            return
+        
+        # 10. CONVERSÃO PARA TENSORFLOW LITE
+        print(f"\n{SEP}")
+        print("CONVERSÃO PARA TENSORFLOW LITE")
+        
+        # Criar conversor (a partir do SavedModel: sem reconstruir o Keras)
+        converter = TFLiteConverter(model_path=saved_model_dir)
+        
+        # Dataset representativo para quantização
+        # (lido sob demanda a partir do X_train, sem cópia separada; no modo
+        # streaming, X_train são caminhos: decodifica só uma amostra sorteada,
+        # sem augmentation, para as faixas int8 refletirem imagens reais)
+        calibration_data = X_train
+        if config['streaming']:
+            import numpy as np
+            from data_loader import ThaiIDDataLoader
+            
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(X_train), min(settings['num_calibration_samples'], len(X_train)),
+                                replace=False)
+            calibration_data, _ = ThaiIDDataLoader(dataset_path).load_images(
+                X_train[sample], config['img_size'])
+        
+        rep_dataset = converter.create_representative_dataset(
+            calibration_data,
+            num_samples=settings['num_calibration_samples']
+        )
+        
+        # Converter com quantização
+        tflite_model = converter.convert_to_tflite(
+            quantization=True,
+            representative_dataset=rep_dataset,
+            optimize_for_size=True,
+            sparse=trainer.model_builder.sparse
+        )
+        
+        if tflite_model is None:
+            print("Erro na conversão para TFLite")
+            return
+        
+        # Salvar modelo TFLite
+        tflite_path = settings['tflite_path']
+        success = converter.save_tflite_model(tflite_model, tflite_path)
+        
+        if not success:
+            print("Erro ao salvar modelo TFLite")
+            return
+        
+        # 11. TESTE DO MODELO TFLITE
+        print(f"\n{SEP}")
+        print("TESTE DO MODELO TFLITE")
+        
+        if extended:
+            test_extensive_model(tflite_path, data, classes)
+        else:
+            # Bytes já em memória: o interpretador não relê o arquivo
+            converter.test_tflite_model(tflite_model, X_test, y_test, verbose=True)
+        
+        # 12. COMPARAÇÃO DE MODELOS
+        print(f"\n{SEP}")
+        print("COMPARAÇÃO DE MODELOS")
+        
+        # trainer.model, não o modelo criado no passo 4: a poda o substitui
+        # pelo modelo podado
+        converter.compare_models(trainer.model, tflite_model, X_test, verbose=True)
+        
+        # 13. INFORMAÇÕES FINAIS
+        print(f"\n{SEP}")
+        print("INFORMAÇÕES DO MODELO FINAL")
+        
+        converter.get_model_info(tflite_model)
+        
+        # 14. RESUMO FINAL
+        print(f"\n{SEP}")
+        print("RESUMO FINAL")
+        print(f"✓ Modelo treinado com {stats['num_images']} imagens")
+        print(f"✓ {data['num_classes']} classes: {', '.join(classes)}")
+        print(f"✓ {config['epochs']} épocas de treinamento + "
+              f"{config['fine_tune_epochs']} épocas de fine-tuning")
+        print(f"✓ Modelo Keras salvo em: {model_path}")
+        print(f"✓ Modelo TFLite salvo em: {tflite_path}")
+        print(f"✓ Gráficos salvos em: {settings['plot_path']}")
+        
+        print(f"\n{SEP}")
+        print("PRÓXIMOS PASSOS")
+        print("1. Teste o modelo TFLite com mais imagens")
+        print("2. Integre o modelo no seu aplicativo Android")
+        print("3. Para melhorar a precisão:")
+        print("   - Adicione mais imagens ao dataset")
+        print("   - Balanceie melhor as classes / ajuste os hiperparâmetros")
+        print("   - Experimente diferentes arquiteturas de modelo")
+    
+    except Exception as e:
+        print(f"\nErro durante a execução: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Treina e converte o modelo TFLite")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    run(parser.parse_args().profile)
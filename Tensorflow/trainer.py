@@ -1,27 +1,164 @@
 import os
 import sys
 import numpy as np
-import matplotlib.pyplot as plt
-from data_loader import ThaiIDDataLoader
+from data_loader import ThaiIDDataLoader, TF_DECODE_EXTENSIONS
 from preprocessor import DataPreprocessor
-from model import ThaiIDModel
+from model import ThaiIDModel, export_saved_model
+
+M_ARENA_MAX = -8  # constante do mallopt (malloc.h da glibc)
+
+def _tune_allocators():
+    """
+    Ajusta os alocadores antes do TensorFlow inicializar. Um MALLOC_ARENA_MAX
+    baixo herdado do ambiente (ex.: 4 em containers/Hadoop) serializa as
+    alocações das threads do TF; a glibc já leu a variável ao iniciar o
+    processo, então o limite padrão (8 arenas por núcleo) é restaurado via
+    mallopt e a variável sai do ambiente dos subprocessos. Na GPU, o
+    alocador assíncrono do CUDA (mempool) é usado se nada foi configurado
+    """
+    if os.environ.pop('MALLOC_ARENA_MAX', None) is not None and sys.platform.startswith('linux'):
+        try:
+            import ctypes
+            ctypes.CDLL('libc.so.6').mallopt(M_ARENA_MAX, 8 * (os.cpu_count() or 1))
+        except (OSError, AttributeError):
+            pass  # libc sem mallopt (ex.: musl)
+    
+    os.environ.setdefault('TF_GPU_ALLOCATOR', 'cuda_malloc_async')
+
+_tune_allocators()
+
+# TensorFlow importado uma única vez, depois do ajuste dos alocadores
+try:
+    import tensorflow as tf
+    HAS_TF = True
+except ImportError:
+    tf = None
+    HAS_TF = False
 
 class ModelTrainer:
-    def __init__(self, dataset_path="dataset/"):
+    def __init__(self, dataset_path="dataset/", distributed=False, auto_jit=False,
+                 cache_images=False):
+        """
+        Args:
+            dataset_path: Pasta raiz do dataset
+            distributed: Treino multi-GPU com Horovod (um processo por GPU,
+                via horovodrun); sem o Horovod instalado segue em um processo
+            auto_jit: Clustering XLA global (todas as funções do TF, não só o
+                passo de treino compilado com jit_compile)
+            cache_images: Cache .npy das imagens decodificadas na raiz do
+                dataset (ver ThaiIDDataLoader)
+        """
         self.dataset_path = dataset_path
+        self.cache_images = cache_images
         self.model_builder = None
         self.model = None
         self.history = None
         self.classes = None
+        self.hvd = self._init_horovod() if distributed else None
+        if HAS_TF:
+            self._configure_graph_optimizer(auto_jit)
+        
+        # Um preprocessador por modo de augmentation, e os pipelines tf.data
+        # já montados por (batch_size, augment), reaproveitados entre fases
+        self._preprocessors = {True: DataPreprocessor(augment=True),
+                               False: DataPreprocessor(augment=False)}
+        self._datasets = {}
+    
+    def _configure_graph_optimizer(self, auto_jit):
+        """
+        Otimizações do grappler (layout NHWC/NCHW, fusão conv+BN+ReLU,
+        simplificação aritmética) e, opcionalmente, o auto-clustering XLA.
+        O determinismo de ops fica desligado (padrão do TF): o cuDNN escolhe
+        os algoritmos mais rápidos e execuções repetidas não são idênticas
+        bit a bit. O auto_mixed_precision do grappler não é usado: a
+        precisão mista vem da policy do Keras (ThaiIDModel)
+        """
+        tf.config.optimizer.set_experimental_options({
+            'layout_optimizer': True,
+            'remapping': True,
+            'arithmetic_optimization': True,
+        })
+        if auto_jit:
+            tf.config.optimizer.set_jit(True)
+            print("Auto-clustering XLA ativado")
+    
+    def _init_horovod(self):
+        """Inicializa o Horovod e fixa uma GPU por processo (local_rank)"""
+        try:
+            import horovod.tensorflow.keras as hvd
+        except ImportError:
+            print("Horovod não está instalado: treinando em um único processo")
+            return None
+        
+        hvd.init()
+        
+        gpus = tf.config.list_physical_devices('GPU')
+        for gpu in gpus:
+            tf.config.experimental.set_memory_growth(gpu, True)
+        if gpus:
+            tf.config.set_visible_devices(gpus[hvd.local_rank()], 'GPU')
         
-    def load_and_prepare_data(self, img_size=(224, 224), balance_strategy='none'):
+        print(f"Horovod: processo {hvd.rank()} de {hvd.size()}")
+        return hvd
+    
+    def is_main_process(self):
+        """True fora do Horovod ou no processo de rank 0 (logs, checkpoints, arquivos)"""
+        return self.hvd is None or self.hvd.rank() == 0
+    
+    def _distributed_callbacks(self, callbacks):
+        """
+        Com Horovod: broadcast dos pesos iniciais do rank 0 e média das
+        métricas entre processos antes dos demais callbacks (EarlyStopping/
+        ReduceLROnPlateau decidem igual em todos); ModelCheckpoint só no rank 0
+        """
+        if self.hvd is None:
+            return callbacks
+        
+        if not self.is_main_process():
+            callbacks = [cb for cb in callbacks
+                         if not isinstance(cb, tf.keras.callbacks.ModelCheckpoint)]
+        return [
+            self.hvd.callbacks.BroadcastGlobalVariablesCallback(0),
+            self.hvd.callbacks.MetricAverageCallback(),
+        ] + callbacks
+        
+    def _weights_path(self, model_path):
+        """Arquivo de pesos do checkpoint de `model_path` (ex.: best_model.weights.h5)"""
+        return os.path.splitext(model_path)[0] + '.weights.h5'
+    
+    def _save_best_model(self, model_path, saved_model=False):
+        """
+        Os checkpoints gravam só os pesos (rápido a cada melhora); ao fim do
+        fit, o melhor checkpoint é salvo uma única vez como modelo completo
+        em `model_path`, sem alterar os pesos atuais do modelo. Com
+        saved_model=True exporta também `<model_path sem .h5>_saved_model`
+        """
+        weights_path = self._weights_path(model_path)
+        if not self.is_main_process() or not os.path.exists(weights_path):
+            return
+        
+        current_weights = self.model.get_weights()
+        self.model.load_weights(weights_path)
+        self.model.save(model_path)
+        if saved_model:
+            export_saved_model(self.model, os.path.splitext(model_path)[0] + '_saved_model')
+        self.model.set_weights(current_weights)
+        print(f"Melhor modelo salvo em: {model_path}")
+    
+    def load_and_prepare_data(self, img_size=(224, 224), balance_strategy='none', streaming=False):
         """
-        Carrega e prepara os dados para treinamento
+        Carrega e prepara os dados para treinamento. As imagens de treino
+        ficam em uint8 (os pipelines tf.data normalizam por lote); validação
+        e teste vêm em float32 [0, 1]
+        
+        Com streaming=True o treino não é carregado na memória: data['train']
+        guarda os caminhos dos arquivos, decodificados lote a lote pelo
+        tf.data (só formatos que o TensorFlow decodifica)
         """
         print("=== CARREGAMENTO E PREPARAÇÃO DOS DADOS ===")
         
         # 1. Carregar dados
-        loader = ThaiIDDataLoader(self.dataset_path)
+        loader = ThaiIDDataLoader(self.dataset_path, cache_images=self.cache_images)
         self.classes = loader.get_class_names()
         num_classes = loader.get_num_classes()
         
@@ -29,51 +166,83 @@ class ModelTrainer:
         print(f"Classes: {self.classes}")
         print(f"Número de classes: {num_classes}")
         
-        # Carregar imagens e labels
-        X, y = loader.load_data_for_classification(img_size=img_size)
+        if streaming:
+            # Só caminhos e labels: balanceamento e splits operam sobre eles
+            X, y = loader.list_classification_samples()
+            decodable = np.array([os.path.splitext(p)[1].lower() in TF_DECODE_EXTENSIONS for p in X],
+                                 dtype=bool)
+            if not decodable.all():
+                print(f"Ignorando {np.count_nonzero(~decodable)} imagens em formato não suportado pelo tf.data")
+                X, y = X[decodable], y[decodable]
+        else:
+            # Carregar imagens (uint8) e labels: balanceamento e splits copiam
+            # 4x menos bytes que em float32
+            X, y = loader.load_data_for_classification(img_size=img_size, normalize=False)
         
         if len(X) == 0:
             raise ValueError("Nenhuma imagem foi carregada. Verifique o dataset.")
         
         print(f"Dados carregados: {len(X)} imagens")
         
-        # 2. Preprocessar dados
-        preprocessor = DataPreprocessor(augment=True)
-        
-        # Normalizar imagens
-        X = preprocessor.normalize_images(X)
+        # 2. Preprocessar dados (novos splits: pipelines anteriores descartados)
+        preprocessor = self._preprocessors[True]
+        self._datasets.clear()
         
         # Balancear dataset se necessário
         if balance_strategy != 'none':
             X, y = preprocessor.balance_dataset(X, y, strategy=balance_strategy)
         
+        # Labels int32 desde a origem (metade dos bytes de int64 nos lotes)
+        y = y.astype(np.int32, copy=False)
+        
         # Criar splits
         (X_train, y_train), (X_val, y_val), (X_test, y_test) = preprocessor.create_data_splits(
             X, y, test_size=0.2, val_size=0.1
         )
         
-        return {
+        # Treino fica em uint8 (normalizado por lote no tf.data); validação
+        # e teste, usados direto por evaluate/predict e pelos testes do
+        # TFLite, são normalizados para float32 em [0, 1]
+        if streaming:
+            if X_val is not None:
+                X_val, loaded = loader.load_images(X_val, img_size)
+                y_val = y_val[loaded]
+            X_test, loaded = loader.load_images(X_test, img_size)
+            y_test = y_test[loaded]
+        else:
+            if X_val is not None:
+                X_val = preprocessor.normalize_images(X_val)
+            X_test = preprocessor.normalize_images(X_test)
+        
+        data = {
             'train': (X_train, y_train),
             'val': (X_val, y_val),
             'test': (X_test, y_test),
             'num_classes': num_classes,
             'img_size': img_size
         }
+        
+        # Pipeline de teste montado uma vez, usado por todas as avaliações
+        if HAS_TF:
+            self._test_dataset(data)
+        
+        return data
     
-    def create_model(self, model_type='mobilenetv2', num_classes=3, input_shape=(224, 224, 3)):
+    def create_model(self, model_type='mobilenetv2', num_classes=3, input_shape=(224, 224, 3),
+                     mixed_precision=False, jit_compile=False):
         """
         Cria o modelo especificado
         """
         print(f"=== CRIAÇÃO DO MODELO: {model_type.upper()} ===")
         
-        self.model_builder = ThaiIDModel(num_classes=num_classes, input_shape=input_shape)
+        self.model_builder = ThaiIDModel(num_classes=num_classes, input_shape=input_shape, hvd=self.hvd)
         
         if model_type == 'mobilenetv2':
-            self.model = self.model_builder.create_mobilenetv2_model()
+            self.model = self.model_builder.create_mobilenetv2_model(mixed_precision=mixed_precision)
         elif model_type == 'custom_cnn':
-            self.model = self.model_builder.create_custom_cnn()
+            self.model = self.model_builder.create_custom_cnn(mixed_precision=mixed_precision)
         elif model_type == 'lightweight':
-            self.model = self.model_builder.create_lightweight_model()
+            self.model = self.model_builder.create_lightweight_model(mixed_precision=mixed_precision)
         else:
             raise ValueError(f"Tipo de modelo não suportado: {model_type}")
         
@@ -81,7 +250,7 @@ class ModelTrainer:
             raise RuntimeError("Falha ao criar o modelo. Verifique se o TensorFlow está instalado.")
         
         # Compilar modelo
-        success = self.model_builder.compile_model(learning_rate=0.001)
+        success = self.model_builder.compile_model(learning_rate=0.001, jit_compile=jit_compile)
         if not success:
             raise RuntimeError("Falha ao compilar o modelo")
         
@@ -91,6 +260,72 @@ class ModelTrainer:
         
         return self.model
     
+    def create_datasets(self, data, batch_size=32, cache_dir=None):
+        """
+        Adiciona a `data` os pipelines tf.data de treino e validação
+        ('train_ds'/'val_ds'), reaproveitados por train/train_extended.
+        Com `cache_dir`, o cache dos splits fica em disco em vez da memória
+        """
+        datasets = self._datasets_for(data, batch_size, augment=True, cache_dir=cache_dir)
+        if datasets is not None:
+            data['train_ds'], data['val_ds'] = datasets
+        
+        return data
+    
+    def _datasets_for(self, data, batch_size, augment, cache_dir=None):
+        """
+        Pipelines tf.data de treino/validação para os splits de `data`,
+        memorizados por (batch_size, augment): chamadas repetidas (fases de
+        treino, varreduras de hiperparâmetros) não remontam os datasets
+        """
+        X_train, y_train = data['train']
+        X_val, y_val = data['val']
+        
+        key = (batch_size, augment)
+        cached = self._datasets.get(key)
+        if cached is not None and cached[0] is X_train:
+            return cached[1]
+        
+        # Com Horovod, cada processo recebe uma fração disjunta do treino
+        # (fatiada antes do shuffle/decodificação/augmentation), em todas as
+        # fases: treino, fine-tuning e poda
+        shards = (self.hvd.size(), self.hvd.rank()) if self.hvd is not None else (1, 0)
+        datasets = self._preprocessors[augment].create_tf_datasets(
+            X_train, y_train, X_val, y_val, batch_size=batch_size,
+            num_classes=data['num_classes'], cache_dir=cache_dir,
+            img_size=data['img_size'], num_shards=shards[0], shard_index=shards[1]
+        )
+        if datasets is not None:
+            self._datasets[key] = (X_train, datasets)
+        return datasets
+    
+    def _train_inputs(self, data, batch_size):
+        """
+        Pipelines tf.data de treino (com augmentation) e validação: os já
+        criados por create_datasets, ou novos para este batch_size
+        """
+        if data.get('train_ds') is not None:
+            train_ds, val_ds = data['train_ds'], data['val_ds']
+        else:
+            train_ds, val_ds = self._datasets_for(data, batch_size, augment=True)
+        
+        return self._to_device(train_ds), self._to_device(val_ds)
+    
+    def _fine_tune_inputs(self, data, batch_size):
+        """Pipelines tf.data sem augmentation para o fine-tuning"""
+        train_ds, val_ds = self._datasets_for(data, batch_size, augment=False)
+        return self._to_device(train_ds), self._to_device(val_ds)
+    
+    def _to_device(self, dataset):
+        """
+        Copia os lotes para a GPU em segundo plano (transferência H2D
+        sobreposta ao passo do modelo). Deve ser a última transformação do
+        pipeline; sem GPU o dataset é devolvido como está
+        """
+        if dataset is None or not tf.config.list_physical_devices('GPU'):
+            return dataset
+        return dataset.apply(tf.data.experimental.prefetch_to_device('/GPU:0', buffer_size=2))
+    
     def train(self, data, epochs=50, batch_size=32, save_best=True):
         """
         Treina o modelo
@@ -98,31 +333,15 @@ class ModelTrainer:
         if self.model is None:
             raise ValueError("Modelo não foi criado. Chame create_model() primeiro.")
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if not HAS_TF:
             raise ImportError("TensorFlow não está instalado!")
         
         print("=== INÍCIO DO TREINAMENTO ===")
         
-        X_train, y_train = data['train']
         X_val, y_val = data['val']
-        X_test, y_test = data['test']
-        num_classes = data['num_classes']
         
-        # Criar geradores de dados
-        preprocessor = DataPreprocessor(augment=True)
-        train_gen, val_gen, (y_train_cat, y_val_cat) = preprocessor.create_data_generators(
-            X_train, y_train, X_val, y_val, batch_size=batch_size, num_classes=num_classes
-        )
-        
-        # Calcular steps por época
-        steps_per_epoch = len(X_train) // batch_size
-        validation_steps = len(X_val) // batch_size if X_val is not None else None
-        
-        print(f"Steps por época: {steps_per_epoch}")
-        if validation_steps:
-            print(f"Validation steps: {validation_steps}")
+        # Pipelines tf.data finitos: o Keras percorre cada um por época
+        train_gen, val_gen = self._train_inputs(data, batch_size)
         
         # Callbacks
         callbacks = []
@@ -149,14 +368,18 @@ class ModelTrainer:
         # Model Checkpoint
         if save_best:
             checkpoint = tf.keras.callbacks.ModelCheckpoint(
-                'best_model.h5',
+                self._weights_path('best_model.h5'),
                 save_best_only=True,
+                save_weights_only=True,
                 monitor='val_accuracy' if X_val is not None else 'accuracy',
                 mode='max',
                 verbose=1
             )
             callbacks.append(checkpoint)
         
+        callbacks = self._distributed_callbacks(callbacks)
+        verbose = 1 if self.is_main_process() else 0
+        
         # Treinamento
         print(f"Iniciando treinamento por {epochs} épocas...")
         
@@ -164,25 +387,24 @@ class ModelTrainer:
             self.history = self.model.fit(
                 train_gen,
                 epochs=epochs,
-                steps_per_epoch=steps_per_epoch,
                 validation_data=val_gen,
-                validation_steps=validation_steps,
                 callbacks=callbacks,
-                verbose=1
+                verbose=verbose
             )
         else:
             self.history = self.model.fit(
                 train_gen,
                 epochs=epochs,
-                steps_per_epoch=steps_per_epoch,
                 callbacks=callbacks,
-                verbose=1
+                verbose=verbose
             )
         
+        if save_best:
+            self._save_best_model('best_model.h5')
+        
         # Avaliação final no conjunto de teste
         print("\n=== AVALIAÇÃO FINAL ===")
-        y_test_cat = tf.keras.utils.to_categorical(y_test, num_classes)
-        test_loss, test_acc = self.model.evaluate(X_test, y_test_cat, verbose=0)
+        _, test_loss, test_acc = self._test_metrics(data)
         
         print(f"Acurácia no conjunto de teste: {test_acc:.4f}")
         print(f"Loss no conjunto de teste: {test_loss:.4f}")
@@ -196,9 +418,7 @@ class ModelTrainer:
         if self.model is None:
             raise ValueError("Modelo não foi treinado ainda!")
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if not HAS_TF:
             raise ImportError("TensorFlow não está instalado!")
         
         print("=== FINE-TUNING ===")
@@ -210,21 +430,12 @@ class ModelTrainer:
             return None
         
         # Recompilar com learning rate menor
-        self.model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
+        self.model_builder.compile_model(learning_rate=learning_rate)
         
-        X_train, y_train = data['train']
         X_val, y_val = data['val']
-        num_classes = data['num_classes']
         
         # Preparar dados
-        preprocessor = DataPreprocessor(augment=False)  # Menos augmentation no fine-tuning
-        train_gen, val_gen, _ = preprocessor.create_data_generators(
-            X_train, y_train, X_val, y_val, batch_size=16, num_classes=num_classes
-        )
+        train_gen, val_gen = self._fine_tune_inputs(data, batch_size=16)
         
         # Callbacks para fine-tuning
         callbacks = [
@@ -234,12 +445,15 @@ class ModelTrainer:
                 restore_best_weights=True
             ),
             tf.keras.callbacks.ModelCheckpoint(
-                'fine_tuned_model.h5',
+                self._weights_path('fine_tuned_model.h5'),
                 save_best_only=True,
+                save_weights_only=True,
                 monitor='val_accuracy' if X_val is not None else 'accuracy'
             )
         ]
         
+        callbacks = self._distributed_callbacks(callbacks)
+        
         # Fine-tuning
         print(f"Iniciando fine-tuning por {epochs} épocas...")
         fine_tune_history = self.model.fit(
@@ -247,11 +461,55 @@ class ModelTrainer:
             epochs=epochs,
             validation_data=val_gen if val_gen else None,
             callbacks=callbacks,
-            verbose=1
+            verbose=1 if self.is_main_process() else 0
         )
+        self._save_best_model('fine_tuned_model.h5')
         
         return fine_tune_history
     
+    def prune_and_fine_tune(self, data, epochs=5, target_sparsity=0.5, batch_size=16,
+                            learning_rate=0.0001):
+        """
+        Poda por magnitude durante um fine-tuning curto e remove os wrappers
+        ao final (pesos esparsos para o delegate XNNPACK)
+        """
+        if self.model is None:
+            raise ValueError("Modelo não foi treinado ainda!")
+        
+        print("=== PODA (PRUNING) ===")
+        
+        X_train, _ = data['train']
+        # Passos por época da fração de treino deste processo
+        num_shards = self.hvd.size() if self.hvd is not None else 1
+        steps_per_epoch = -(-(len(X_train) // num_shards) // batch_size)
+        
+        if not self.model_builder.enable_pruning(end_step=steps_per_epoch * epochs,
+                                                 target_sparsity=target_sparsity):
+            print("Poda não disponível")
+            return None
+        
+        import tensorflow_model_optimization as tfmot
+        
+        self.model = self.model_builder.model
+        self.model_builder.compile_model(learning_rate=learning_rate)
+        
+        train_gen, val_gen = self._fine_tune_inputs(data, batch_size=batch_size)
+        
+        print(f"Iniciando fine-tuning com poda por {epochs} épocas...")
+        prune_history = self.model.fit(
+            train_gen,
+            epochs=epochs,
+            validation_data=val_gen,
+            callbacks=self._distributed_callbacks([tfmot.sparsity.keras.UpdatePruningStep()]),
+            verbose=1 if self.is_main_process() else 0
+        )
+        
+        self.model_builder.strip_pruning()
+        self.model = self.model_builder.model
+        self.model_builder.compile_model(learning_rate=learning_rate)
+        
+        return prune_history
+    
     def plot_training_history(self, save_path=None):
         """
         Plota gráficos do histórico de treinamento
@@ -297,16 +555,16 @@ class ModelTrainer:
         plt.show()
     
     def train_extended(self, data, epochs=100, batch_size=8, learning_rate=0.0005, 
-                      patience=15, save_best=True):
+                      patience=15, save_best=True, accum_steps=1):
         """
-        Treinamento estendido com monitoramento avançado
+        Treinamento estendido com monitoramento avançado. Com accum_steps > 1
+        os pesos são atualizados a cada accum_steps lotes (lote efetivo de
+        batch_size * accum_steps)
         """
         if self.model is None:
             raise ValueError("Modelo não foi criado. Chame create_model() primeiro.")
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if not HAS_TF:
             raise ImportError("TensorFlow não está instalado!")
         
         print("=== TREINAMENTO ESTENDIDO ===")
@@ -315,45 +573,29 @@ class ModelTrainer:
         print(f"Learning rate: {learning_rate}")
         print(f"Paciência: {patience}")
         
-        X_train, y_train = data['train']
-        X_val, y_val = data['val']
-        X_test, y_test = data['test']
-        num_classes = data['num_classes']
-        
         # Recompilar com learning rate personalizado
-        self.model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
+        self.model_builder.compile_model(learning_rate=learning_rate, accum_steps=accum_steps)
         
-        # Criar geradores de dados
-        preprocessor = DataPreprocessor(augment=True)
-        train_gen, val_gen, _ = preprocessor.create_data_generators(
-            X_train, y_train, X_val, y_val, batch_size=batch_size, num_classes=num_classes
-        )
+        # Pipelines tf.data finitos: o Keras percorre cada um por época
+        train_gen, val_gen = self._train_inputs(data, batch_size)
         
         # Callbacks avançados
         callbacks = self._create_advanced_callbacks(patience, save_best, learning_rate)
+        callbacks = self._distributed_callbacks(callbacks)
         
         # Treinamento
-        steps_per_epoch = max(1, len(X_train) // batch_size)
-        validation_steps = max(1, len(X_val) // batch_size) if X_val is not None else None
-        
-        print(f"Steps por época: {steps_per_epoch}")
-        if validation_steps:
-            print(f"Validation steps: {validation_steps}")
         
         self.history = self.model.fit(
             train_gen,
             epochs=epochs,
-            steps_per_epoch=steps_per_epoch,
             validation_data=val_gen,
-            validation_steps=validation_steps,
             callbacks=callbacks,
-            verbose=1
+            verbose=1 if self.is_main_process() else 0
         )
         
+        if save_best:
+            self._save_best_model('best_model_extended.h5')
+        
         # Avaliação final detalhada
         self._evaluate_final_performance(data)
         
@@ -361,9 +603,7 @@ class ModelTrainer:
     
     def _create_advanced_callbacks(self, patience, save_best, learning_rate):
         """Cria callbacks avançados para treinamento"""
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if not HAS_TF:
             return []
         
         callbacks = []
@@ -392,12 +632,12 @@ class ModelTrainer:
         # Model Checkpoint para melhor modelo
         if save_best:
             checkpoint = tf.keras.callbacks.ModelCheckpoint(
-                'best_model_extended.h5',
+                self._weights_path('best_model_extended.h5'),
                 save_best_only=True,
                 monitor='val_accuracy',
                 mode='max',
                 verbose=1,
-                save_weights_only=False
+                save_weights_only=True
             )
             callbacks.append(checkpoint)
         
@@ -414,14 +654,15 @@ class ModelTrainer:
         
         return callbacks
     
-    def fine_tune_extended(self, data, epochs=30, learning_rate=0.00005):
-        """Fine-tuning estendido com mais épocas"""
+    def fine_tune_extended(self, data, epochs=30, learning_rate=0.00005, accum_steps=1):
+        """
+        Fine-tuning estendido com mais épocas (lotes de 4; accum_steps como
+        em train_extended)
+        """
         if self.model is None:
             raise ValueError("Modelo não foi treinado ainda!")
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if not HAS_TF:
             raise ImportError("TensorFlow não está instalado!")
         
         print("=== FINE-TUNING ESTENDIDO ===")
@@ -433,21 +674,10 @@ class ModelTrainer:
             return None
         
         # Recompilar com learning rate muito baixo
-        self.model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
-        
-        X_train, y_train = data['train']
-        X_val, y_val = data['val']
-        num_classes = data['num_classes']
+        self.model_builder.compile_model(learning_rate=learning_rate, accum_steps=accum_steps)
         
         # Dados sem augmentation para fine-tuning
-        preprocessor = DataPreprocessor(augment=False)
-        train_gen, val_gen, _ = preprocessor.create_data_generators(
-            X_train, y_train, X_val, y_val, batch_size=4, num_classes=num_classes
-        )
+        train_gen, val_gen = self._fine_tune_inputs(data, batch_size=4)
         
         # Callbacks para fine-tuning
         callbacks = [
@@ -464,48 +694,96 @@ class ModelTrainer:
                 min_lr=learning_rate / 100
             ),
             tf.keras.callbacks.ModelCheckpoint(
-                'fine_tuned_model_extended.h5',
+                self._weights_path('fine_tuned_model_extended.h5'),
                 save_best_only=True,
+                save_weights_only=True,
                 monitor='val_accuracy'
             )
         ]
         
+        callbacks = self._distributed_callbacks(callbacks)
+        
         print(f"Iniciando fine-tuning estendido por {epochs} épocas...")
         fine_tune_history = self.model.fit(
             train_gen,
             epochs=epochs,
             validation_data=val_gen,
             callbacks=callbacks,
-            verbose=1
+            verbose=1 if self.is_main_process() else 0
         )
+        # SavedModel ao lado do .h5: convertido direto pelo update.py
+        self._save_best_model('fine_tuned_model_extended.h5', saved_model=True)
         
         return fine_tune_history
     
+    def _test_dataset(self, data, batch_size=64):
+        """
+        Pipeline tf.data (imagem, label) do conjunto de teste, em lotes com
+        prefetch; montado uma vez e guardado em data['test_ds']
+        """
+        if data.get('test_ds') is None:
+            X_test, y_test = data['test']
+            data['test_ds'] = self._to_device(
+                tf.data.Dataset.from_tensor_slices((X_test, np.asarray(y_test, dtype=np.int32)))
+                .batch(batch_size)
+                .prefetch(tf.data.AUTOTUNE)
+            )
+        return data['test_ds']
+    
+    def _predict_batched(self, dataset, num_samples):
+        """
+        Predições chamando o modelo direto sobre os lotes (imagem, label) de
+        um tf.data com prefetch: sem o laço de callbacks/progbar do predict()
+        """
+        predictions = None
+        offset = 0
+        for batch, _ in dataset:
+            batch_preds = self.model(batch, training=False).numpy()
+            if predictions is None:
+                predictions = np.empty((num_samples, batch_preds.shape[1]), dtype=batch_preds.dtype)
+            predictions[offset:offset + len(batch_preds)] = batch_preds
+            offset += len(batch_preds)
+        return predictions
+    
+    def _test_metrics(self, data):
+        """
+        Predições do conjunto de teste numa única passada, com a loss
+        (entropia cruzada esparsa) e a acurácia calculadas a partir delas,
+        sem um evaluate() separado. Retorna (predições, loss, acurácia)
+        """
+        _, y_test = data['test']
+        predictions = self._predict_batched(self._test_dataset(data), len(y_test))
+        
+        probs = np.take_along_axis(predictions, y_test[:, None].astype(np.intp), axis=1)[:, 0]
+        # Mesmo epsilon da loss do Keras sobre probabilidades
+        test_loss = float(-np.mean(np.log(np.clip(probs, 1e-7, 1.0))))
+        test_acc = float(np.mean(predictions.argmax(axis=1) == y_test))
+        return predictions, test_loss, test_acc
+    
     def evaluate_model_detailed(self, data):
         """Avaliação detalhada do modelo"""
         try:
-            import tensorflow as tf
             from sklearn.metrics import classification_report, confusion_matrix
         except ImportError:
+            classification_report = None
+        
+        if not HAS_TF or classification_report is None:
             print("Bibliotecas necessárias não estão disponíveis")
             return
         
         print("=== AVALIAÇÃO DETALHADA ===")
         
-        X_test, y_test = data['test']
-        num_classes = data['num_classes']
+        _, y_test = data['test']
         
-        # Converter labels para categorical
-        y_test_cat = tf.keras.utils.to_categorical(y_test, num_classes)
-        
-        # Avaliação básica
-        test_loss, test_acc = self.model.evaluate(X_test, y_test_cat, verbose=0)
+        # Avaliação básica e predições numa única passada pelo teste
+        predictions, test_loss, test_acc = self._test_metrics(data)
         print(f"Acurácia no teste: {test_acc:.4f}")
         print(f"Loss no teste: {test_loss:.4f}")
         
-        # Predições
-        predictions = self.model.predict(X_test, verbose=0)
-        predicted_classes = np.argmax(predictions, axis=1)
+        # Uma única passada sobre (N, C): argmax e gather da confiança
+        # correspondente; as estatísticas usam só o vetor (N,)
+        predicted_classes = predictions.argmax(axis=1)
+        confidences = np.take_along_axis(predictions, predicted_classes[:, None], axis=1)[:, 0]
         
         # Relatório de classificação
         if self.classes and len(self.classes) > 0:
@@ -518,7 +796,6 @@ class ModelTrainer:
         print(cm)
         
         # Análise de confiança
-        confidences = np.max(predictions, axis=1)
         print(f"\nEstatísticas de Confiança:")
         print(f"  Confiança média: {np.mean(confidences):.4f}")
         print(f"  Confiança mínima: {np.min(confidences):.4f}")
@@ -527,28 +804,21 @@ class ModelTrainer:
     
     def _evaluate_final_performance(self, data):
         """Avaliação final de performance"""
-        X_test, y_test = data['test']
-        num_classes = data['num_classes']
+        _, y_test = data['test']
         
-        try:
-            import tensorflow as tf
-        except ImportError:
+        if not HAS_TF:
             return
         
-        y_test_cat = tf.keras.utils.to_categorical(y_test, num_classes)
-        
-        # Avaliação final
-        final_metrics = self.model.evaluate(X_test, y_test_cat, verbose=0)
+        # Avaliação final (loss e acurácia derivadas das mesmas predições)
+        predictions, test_loss, test_acc = self._test_metrics(data)
         
         print(f"\n=== PERFORMANCE FINAL ===")
-        metric_names = self.model.metrics_names
-        for name, value in zip(metric_names, final_metrics):
-            print(f"{name}: {value:.4f}")
+        print(f"loss: {test_loss:.4f}")
+        print(f"accuracy: {test_acc:.4f}")
         
         # Predições para análise adicional
-        predictions = self.model.predict(X_test, verbose=0)
-        predicted_classes = np.argmax(predictions, axis=1)
-        correct = np.sum(predicted_classes == y_test)
+        predicted_classes = predictions.argmax(axis=1)
+        correct = np.count_nonzero(predicted_classes == y_test)
         
         print(f"Predições corretas: {correct}/{len(y_test)}")
         print(f"Acurácia calculada: {correct/len(y_test):.4f}")
@@ -621,13 +891,17 @@ class ModelTrainer:
         
         plt.show()
 
-    def save_model(self, filepath="thai_id_model.h5"):
+    def save_model(self, filepath="thai_id_model.h5", quantize=None, representative_data=None,
+                   saved_model_dir=None):
         """
-        Salva o modelo treinado
+        Salva o modelo treinado (opcionalmente exportando um .tflite
+        quantizado e um SavedModel; ver ThaiIDModel.save_model)
         """
         if self.model is None:
             print("Nenhum modelo para salvar")
             return False
         
-        success = self.model_builder.save_model(filepath)
+        success = self.model_builder.save_model(filepath, quantize=quantize,
+                                                representative_data=representative_data,
+                                                saved_model_dir=saved_model_dir)
         return success
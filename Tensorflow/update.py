@@ -1,18 +1,65 @@
+import os
+import numpy as np
 import tensorflow as tf
+from data_loader import ThaiIDDataLoader
 
-# Carregar seu modelo
-model = tf.keras.models.load_model('fine_tuned_model_extended.h5')
+# SavedModel exportado pelo fine_tune_extended (trainer.py) ao lado do .h5
+SAVED_MODEL_DIR = 'fine_tuned_model_extended_saved_model'
 
-# Converter com configurações de compatibilidade
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-converter.target_spec.supported_ops = [
-    tf.lite.OpsSet.TFLITE_BUILTINS,  # Enable TensorFlow Lite ops
-]
+def load_calibration_images(num_samples=100, img_size=(224, 224)):
+    """
+    Imagens de calibração para a quantização int8 (ativações e pesos):
+    `num_samples` caminhos sorteados do dataset inteiro (todas as classes,
+    não só as primeiras da listagem), e só eles são decodificados
+    """
+    try:
+        loader = ThaiIDDataLoader("dataset/")
+        paths, _ = loader.list_classification_samples()
+    except FileNotFoundError:
+        paths = []
+    
+    if len(paths) == 0:
+        return np.empty((0, img_size[1], img_size[0], 3), dtype=np.float32)
+    
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(paths), min(num_samples, len(paths)), replace=False)
+    images, _ = loader.load_images(paths[sample], img_size)
+    return images
 
-# Converter
-tflite_model = converter.convert()
+def convert(output_path='model2.tflite'):
+    """Converte o modelo fine-tuned estendido para TFLite (int8 quando há dataset)"""
+    X_calib = load_calibration_images()
+    
+    def rep_data():
+        for x in X_calib:
+            yield [x[None]]
+    
+    # Converter com configurações de compatibilidade
+    if os.path.isdir(SAVED_MODEL_DIR):
+        # Converte direto do grafo exportado, sem reconstruir o modelo Keras
+        converter = tf.lite.TFLiteConverter.from_saved_model(SAVED_MODEL_DIR)
+    else:
+        model = tf.keras.models.load_model('fine_tuned_model_extended.h5', compile=False)
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if len(X_calib):
+        # int8 completo, inclusive I/O (kernels int8 do XNNPACK em ARM)
+        converter.representative_dataset = rep_data
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    else:
+        print("Dataset não encontrado: usando quantização dinâmica")
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS,  # Enable TensorFlow Lite ops
+        ]
+    
+    # Converter
+    tflite_model = converter.convert()
+    
+    # Salvar
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
 
-# Salvar
-with open('model2.tflite', 'wb') as f:
-    f.write(tflite_model)
\ No newline at end of file
+if __name__ == "__main__":
+    convert()